@@ -0,0 +1,52 @@
+"""
+Overhead of Collection over plain DataFrames for concat and slicing.
+
+Run from the repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_sqlite.py python benchmarks/collection.py
+"""
+import timeit
+
+import numpy
+import pandas
+
+import jardin.config as config
+config.init()
+
+from jardin import Model
+
+
+class Widget(Model):
+    db_names = {'replica': 'jardin_test', 'master': 'jardin_test'}
+
+
+def frame(rows):
+    return pandas.DataFrame({
+        'id': numpy.arange(rows),
+        'price': numpy.ones(rows),
+        'quantity': numpy.arange(rows) % 10
+        })
+
+
+if __name__ == '__main__':
+    rows = 1000000
+    df = frame(rows)
+    small = [frame(10) for _ in range(100)]
+    collection = Widget.collection_instance(df)
+    small_collections = [Widget.collection_instance(f) for f in small]
+    cases = [
+        ('concat 100 small DataFrames', lambda: pandas.concat(small)),
+        ('concat 100 small Collections', lambda: pandas.concat(small_collections)),
+        ('concat 2 large DataFrames', lambda: pandas.concat([df, df])),
+        ('concat 2 large Collections', lambda: pandas.concat([collection, collection])),
+        ('mask DataFrame', lambda: df[df.quantity > 5]),
+        ('mask Collection', lambda: collection[collection.quantity > 5]),
+        ('iloc row DataFrame', lambda: df.iloc[10]),
+        ('iloc row Collection', lambda: collection.iloc[10]),
+        ('column DataFrame', lambda: df['price']),
+        ('column Collection', lambda: collection['price']),
+        ]
+    for name, func in cases:
+        number = 20
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print('  %-30s %10.1f us' % (name, seconds / number * 1e6))
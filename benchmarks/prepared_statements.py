@@ -0,0 +1,66 @@
+"""
+Per-query cost of server-side prepared statements on PostgreSQL.
+
+Runs the same lookups by primary key, and a join, with ``PREPARED_STATEMENTS``
+off and on, against a local server configured like the test suite
+(``PGPORT``, ``PGUSER``, ``PGPASSWORD``, ``PGDATABASE``). Run from the repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_pg.py python benchmarks/prepared_statements.py [queries]
+"""
+import random
+import sys
+import time
+
+import jardin
+import jardin.config as config
+config.init()
+
+
+class BenchUser(jardin.Model):
+    db_names = {'master': 'jardin_test', 'replica': 'jardin_test'}
+
+
+class BenchOrder(jardin.Model):
+    db_names = {'master': 'jardin_test', 'replica': 'jardin_test'}
+    belongs_to = {'bench_users': 'bench_user_id'}
+
+
+def setup(rows):
+    for table in ('bench_orders', 'bench_users'):
+        jardin.query(sql='DROP TABLE IF EXISTS %s;' % table, db='jardin_test')
+    jardin.query(sql='CREATE TABLE bench_users (id serial PRIMARY KEY, name varchar(256), created_at timestamp);', db='jardin_test')
+    jardin.query(sql='CREATE TABLE bench_orders (id serial PRIMARY KEY, bench_user_id integer, total numeric);', db='jardin_test')
+    jardin.query(sql="INSERT INTO bench_users (name, created_at) SELECT 'user ' || i, now() FROM generate_series(1, %d) i;" % rows, db='jardin_test')
+    jardin.query(sql="INSERT INTO bench_orders (bench_user_id, total) SELECT mod(i, %d) + 1, i FROM generate_series(1, %d) i;" % (rows, rows * 5), db='jardin_test')
+    jardin.query(sql='CREATE INDEX ON bench_orders (bench_user_id);', db='jardin_test')
+
+def find(ids):
+    for id in ids:
+        BenchUser.find(id)
+
+def join(ids):
+    for id in ids:
+        BenchOrder.select(
+            select=['bench_orders.id', 'bench_orders.total', 'bu.name'],
+            inner_join=[BenchUser],
+            where={'bu.id': id}
+            )
+
+def measure(func, ids, prepared):
+    config.PREPARED_STATEMENTS = prepared
+    jardin.reset_session()
+    func(ids[:10])
+    start = time.perf_counter()
+    func(ids)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+if __name__ == '__main__':
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = 10000
+    setup(rows)
+    ids = [random.randint(1, rows) for _ in range(queries)]
+    for func in (find, join):
+        plain = measure(func, ids, False)
+        prepared = measure(func, ids, True)
+        print('%-5s plain %7.1f us/query  prepared %7.1f us/query' % (func.__name__, plain, prepared))
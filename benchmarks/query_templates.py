@@ -0,0 +1,48 @@
+"""
+Cost of building the SQL of a select query.
+
+Compares ``SelectQueryBuilder`` with and without the template cache, for a few
+query shapes. Run from the repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_sqlite.py python benchmarks/query_templates.py
+"""
+import timeit
+
+import jardin.config as config
+config.init()
+
+from jardin.database.clients.pg import Lexicon
+from jardin.query_builders import SelectQueryBuilder, query_templates
+
+
+METADATA = {
+    'table_name': 'users',
+    'table_alias': 'u',
+    'table_schema': {},
+    'belongs_to': {},
+    'scopes': {'active': {'deleted_at': None}},
+    }
+
+SHAPES = {
+    'find': {'where': {'id': 1}, 'limit': 1},
+    'dict': {'where': {'id': [1, 2, 3], 'name': 'jardin', 'deleted_at': None}, 'order': 'id', 'limit': 10},
+    'sql': {'where': ['name = %(name)s OR email = %(email)s', {'name': 'jardin', 'email': 'a@b.c'}], 'scopes': ['active']},
+    }
+
+def build(kwargs):
+    return SelectQueryBuilder(
+        model_metadata=METADATA, lexicon=Lexicon, scheme='postgres', stack='app.py:handler:1', **kwargs
+        ).query
+
+
+if __name__ == '__main__':
+    number = 20000
+    size = config.QUERY_TEMPLATE_CACHE_SIZE
+    for name, kwargs in SHAPES.items():
+        timings = []
+        for cache_size in (0, size):
+            config.QUERY_TEMPLATE_CACHE_SIZE = cache_size
+            query_templates.clear()
+            timings += [timeit.timeit(lambda: build(kwargs), number=number) / number * 1e6]
+        print('%-6s uncached %6.1f us  cached %6.1f us' % (name, timings[0], timings[1]))
+    print(query_templates.stats())
@@ -0,0 +1,83 @@
+"""
+Cost of building records.
+
+Relationships are wired once per class; the legacy column re-wires them on every
+instantiation, as ``Model.__init__`` used to. Iterating a collection is compared
+with the legacy row-by-row ``iloc`` iterator and with record views. Run from the
+repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_sqlite.py python benchmarks/records.py
+"""
+import time
+import timeit
+
+import numpy
+
+import jardin.config as config
+config.init()
+
+from jardin import Model
+from jardin.query import query
+
+
+DB = 'jardin_test'
+ROW = {'id': 1, 'name': 'widget', 'price': 1.5, 'quantity': 3}
+
+
+class Widget(Model):
+    db_names = {'replica': DB, 'master': DB}
+
+
+def model_with(relationships):
+    children = [
+        type('Child%d' % i, (Model,), {'db_names': Widget.db_names, 'belongs_to': {'widgets': 'widget_id'}})
+        for i in range(relationships)
+        ]
+    return type('Widget', (Model,), {'db_names': Widget.db_names, 'has_many': children})
+
+def legacy_init_relationships(record):
+    this_table_name = record._table_name()
+    for h in record.has_many:
+        other_table_name = h._table_name()
+        def func(slf, **kwargs):
+            where = kwargs.get('where', {})
+            where.update(**{h.belongs_to[this_table_name]: getattr(slf, slf.primary_key)})
+            kwargs['where'] = where
+            return h.select(**kwargs)
+        setattr(record.__class__, other_table_name, func)
+
+def legacy_records(collection):
+    for i in range(len(collection)):
+        yield collection.model_class(**collection.iloc[i])
+
+def iterate(records):
+    start = time.perf_counter()
+    for record in records:
+        record.name
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    query('CREATE TABLE IF NOT EXISTS widgets (id INTEGER PRIMARY KEY, name text, price real, quantity int)', db=DB)
+    number = 20000
+    try:
+        for relationships in (0, 5, 20):
+            model = model_with(relationships)
+            model(**ROW)
+            current = timeit.timeit(lambda: model(**ROW), number=number)
+            legacy = timeit.timeit(lambda: legacy_init_relationships(model(**ROW)), number=number)
+            print('%2d relationships  current %6.2f us/record  legacy %6.2f us/record' % (
+                relationships, current / number * 1e6, legacy / number * 1e6))
+        rows = 100000
+        collection = Widget.collection_instance({
+            'id': numpy.arange(rows),
+            'name': ['widget'] * rows,
+            'price': numpy.ones(rows),
+            'quantity': numpy.arange(rows) % 10
+            })
+        print('iterating %d rows' % rows)
+        print('  records()           %6.2f s' % iterate(collection.records()))
+        print('  records(view=True)  %6.2f s' % iterate(collection.records(view=True)))
+        print('  legacy iloc         %6.2f s' % iterate(legacy_records(collection)))
+    finally:
+        query('DROP TABLE widgets', db=DB)
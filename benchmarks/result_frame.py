@@ -0,0 +1,81 @@
+"""
+Cost of turning cursor rows into a DataFrame.
+
+Compares ``DataFrame.from_records(coerce_float=True)`` with the columnar,
+schema-typed ``build_frame`` on rows fetched from a sqlite table, for both wall
+time and peak traced memory. Run from the repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_sqlite.py python benchmarks/result_frame.py [rows]
+"""
+import gc
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+import pandas
+
+import jardin.config as config
+config.init()
+
+from jardin.database.results import build_frame
+
+
+SCHEMA = {
+    'id': {'type': 'INTEGER'},
+    'user_id': {'type': 'bigint'},
+    'name': {'type': 'varchar(256)'},
+    'price': {'type': 'decimal'},
+    'quantity': {'type': 'integer'},
+    'active': {'type': 'boolean'},
+    'created_at': {'type': 'timestamp'},
+    }
+
+
+def fetch(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        'CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id bigint, name varchar(256), '
+        'price decimal, quantity integer, active boolean, created_at timestamp)'
+        )
+    conn.execute(
+        'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) '
+        "INSERT INTO orders SELECT i, i % 1000, 'order ' || i, i * 0.5, "
+        "CASE WHEN i % 10 = 0 THEN NULL ELSE i % 7 END, i % 2, '2020-01-01 00:00:00' FROM n",
+        (rows,)
+        )
+    cursor = conn.execute('SELECT * FROM orders')
+    results = cursor.fetchall()
+    columns = [c[0] for c in cursor.description]
+    conn.close()
+    return results, columns
+
+def from_records(results, columns):
+    return pandas.DataFrame.from_records(results, columns=columns, coerce_float=True)
+
+def columnar(results, columns):
+    return build_frame(results, columns, SCHEMA)
+
+def measure(func, results, columns):
+    gc.collect()
+    start = time.perf_counter()
+    df = func(results, columns)
+    seconds = time.perf_counter() - start
+    del df
+    gc.collect()
+    tracemalloc.start()
+    df = func(results, columns)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, df
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    results, columns = fetch(rows)
+    print('%d rows' % rows)
+    for func in (from_records, columnar):
+        seconds, peak, df = measure(func, results, columns)
+        print('  %-12s %8.3f s  peak %8.1f MB  frame %8.1f MB' % (
+            func.__name__, seconds, peak / 1e6, df.memory_usage(deep=True).sum() / 1e6))
+        print('  %-12s %s' % ('', ', '.join('%s:%s' % (c, t) for c, t in df.dtypes.items())))
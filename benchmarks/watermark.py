@@ -0,0 +1,45 @@
+"""
+Per-call overhead of call-site watermarking.
+
+Compares the legacy ``inspect.stack()`` marker with the frame walker used by
+``WATERMARK_MODE = 'frame'``, at a few stack depths. Run from the repository root::
+
+    PYTHONPATH=. JARDIN_CONF=tests/jardin_conf_sqlite.py python benchmarks/watermark.py
+"""
+import inspect
+import timeit
+
+import jardin.config as config
+config.init()
+
+from jardin.tools import stack_marker, watermark_marker
+
+
+def noop():
+    return ''
+
+def legacy():
+    return stack_marker(inspect.stack())
+
+def frame():
+    return watermark_marker(mode='frame')
+
+def sampled():
+    return watermark_marker(mode='sampled')
+
+def off():
+    return watermark_marker(mode='off')
+
+def at_depth(depth, func):
+    if depth == 0:
+        return func()
+    return at_depth(depth - 1, func)
+
+
+if __name__ == '__main__':
+    number = 2000
+    for depth in (10, 50):
+        print('stack depth ~%d' % depth)
+        for func in (noop, legacy, frame, sampled, off):
+            seconds = timeit.timeit(lambda: at_depth(depth, func), number=number)
+            print('  %-8s %10.2f us/call' % (func.__name__, seconds / number * 1e6))
@@ -4,6 +4,8 @@ if not hasattr(sys, 'jardin_setup') or (hasattr(sys, 'jardin_setup') and not sys
     from jardin.model import Model, Collection
     from jardin.query import query
     from jardin.tools import reset_session
+    from jardin.database.schema_cache import preload_schemas
+    from jardin.database.sql_templates import preload_queries
     import jardin.config
 
 __author__ = 'Emmanuel Turlay'
@@ -2,6 +2,7 @@ import os
 from jardin import config as config
 from jardin.cache_stores.disk import Disk
 from jardin.cache_stores.s3 import S3
+from jardin.database.results import arrow_backed
 
 config.init()
 
@@ -42,6 +43,8 @@ def cached(func):
         if key in store and not store.expired(key, ttl):
             cached_value = store[key]
             if cached_value is not None:
+                if (kwargs.get('dtype_backend') or config.DTYPE_BACKEND) == 'pyarrow':
+                    cached_value = arrow_backed(cached_value)
                 return cached_value
         
         # get results from func
@@ -1,7 +1,6 @@
 from abc import ABCMeta, abstractmethod
 
 import hashlib
-import inspect
 
 
 class Base(object):
@@ -45,8 +44,7 @@ class Base(object):
         return True
 
     def key(self, *args, **kwargs):
-        stack = inspect.stack()
-        caller = kwargs.pop('caller', stack[-2])
+        kwargs.pop('caller', None)
         instance = kwargs.pop('instance', self)
         kwargs.pop('stack', None)
 
@@ -0,0 +1,114 @@
+"""
+Generates static Model definitions from a database's catalog, so that
+``Model.table_schema()`` never has to query it::
+
+    JARDIN_CONF=jardin_conf.py python -m jardin.codegen --db my_db --output models.py
+"""
+import argparse
+import sys
+
+from jardin.model import Model
+from jardin.database.schema_cache import SchemaCache
+
+
+HEADER = '''# Generated by `python -m jardin.codegen --db %(db)s`.
+# Regenerate it rather than editing it when the schema changes.
+from %(base_module)s import %(base_name)s
+'''
+
+CLASS = '''
+
+class %(class_name)s(%(base_name)s):
+    db_names = {'master': %(db)r, 'replica': %(db)r}
+    table_name = %(table_name)r
+    primary_key = %(primary_key)r
+    _table_schema = {
+%(columns)s
+        }
+'''
+
+
+def class_name(table_name):
+    """
+    Returns the model class name for a table, e.g. ``JardinUser`` for ``jardin_users``.
+    """
+    import inflect
+    words = table_name.split('_')
+    words[-1] = inflect.engine().singular_noun(words[-1]) or words[-1]
+    return ''.join(word[:1].upper() + word[1:] for word in words)
+
+
+def table_schema(db, table_name, primary_key='id'):
+    """
+    Returns the table schema of ``table_name``, as ``Model.table_schema()`` would.
+    """
+    model = type(
+        class_name(table_name),
+        (Model,),
+        {'db_names': {'master': db, 'replica': db}, 'table_name': table_name, 'primary_key': primary_key}
+        )
+    return model.table_schema()
+
+
+def generate(db, tables=None, base='jardin.Model', primary_key='id'):
+    """
+    Returns the source of a module defining a model for each table of the database ``db``.
+
+    :param db: Database name from your ``jardin_conf.py``.
+    :type db: string
+    :param tables: `optional` Names of the tables to generate models for. Defaults to every table.
+    :type tables: list
+    :param base: Dotted path of the class the models inherit from.
+    :type base: string
+    :param primary_key: Primary key column of the tables.
+    :type primary_key: string
+    :returns: string
+    """
+    catalog = SchemaCache.get(db).load()
+    base_module, base_name = base.rsplit('.', 1)
+    source = HEADER % {'db': db, 'base_module': base_module, 'base_name': base_name}
+    names = set()
+    for table_name in sorted(tables or catalog.keys()):
+        if table_name not in catalog:
+            raise ValueError('Table %s not found in database %s' % (table_name, db))
+        name = class_name(table_name)
+        if name in names:
+            name = ''.join(word[:1].upper() + word[1:] for word in table_name.split('_'))
+        names.add(name)
+        columns = [
+            '        %r: %r,' % (column, info)
+            for (column, info) in table_schema(db, table_name, primary_key).items()
+            ]
+        source += CLASS % {
+            'class_name': name,
+            'base_name': base_name,
+            'db': db,
+            'table_name': table_name,
+            'primary_key': primary_key,
+            'columns': '\n'.join(columns)
+            }
+    return source
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m jardin.codegen',
+        description='Generates Model classes with a static table schema from a database catalog.'
+        )
+    parser.add_argument('--db', required=True, help='Database name from your jardin_conf.py.')
+    parser.add_argument('--output', help='File to write the models to. Defaults to the standard output.')
+    parser.add_argument('--table', action='append', dest='tables', help='Table to generate a model for, can be repeated. Defaults to every table.')
+    parser.add_argument('--base', default='jardin.Model', help='Dotted path of the class the models inherit from.')
+    parser.add_argument('--primary-key', default='id', help='Primary key column of the tables.')
+    args = parser.parse_args(argv)
+
+    source = generate(args.db, tables=args.tables, base=args.base, primary_key=args.primary_key)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,17 @@ from jardin.instrumentation.notifier import Notifier
 DEFAULTS = {
     'APPLICATION_NAME': None,
     'WATERMARK': '',
+    'WATERMARK_MODE': 'frame',
+    'WATERMARK_SAMPLE_RATE': 0.01,
+    'WATERMARK_TRANSPORT': 'comment',
+    'NULLABLE_INTEGERS': False,
+    'DTYPE_BACKEND': 'numpy',
+    'COMPACT': False,
+    'IDENTITY_MAP': False,
+    'QUERY_TEMPLATE_CACHE_SIZE': 1024,
+    'IN_LIST_THRESHOLD': 100,
+    'PREPARED_STATEMENTS': False,
+    'PREPARED_STATEMENTS_CACHE_SIZE': 100,
     'LOG_LEVEL': logging.INFO,
     'CACHE': {
         'method': None,
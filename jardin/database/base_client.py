@@ -1,3 +1,4 @@
+import collections
 import time
 from abc import ABC, abstractmethod
 import jardin.config as config
@@ -6,11 +7,23 @@ from jardin.instrumentation.instrumenter import instrumention
 
 class BaseClient(ABC):
 
+    # Whether streamed results need a connection of their own, e.g. when an unbuffered
+    # cursor blocks its connection until all rows are read.
+    dedicated_stream_connection = False
+
+    # Errors preparing or executing a prepared statement after which the query is run as is.
+    statement_exceptions = tuple()
+
     def __init__(self, db_config, name):
         self.db_config = db_config
         self.name = name
         self._conn = None
         self._banned_until = None
+        # Names of the statements prepared on the current connection, indexed by template
+        self._statements = collections.OrderedDict()
+        self._statement_count = 0
+        # Watermark set on the current connection's session
+        self._session_watermark = None
         self._id = self.db_config.scheme + "://" + ":".join([self.db_config.host, self.db_config.database])
 
     @property
@@ -72,25 +85,171 @@ class BaseClient(ABC):
 
         return True
 
-    def execute(self, *query, write=False, **kwargs):
-        """Connect to the database (if necessary) and execute a query."""
-        cursor = None
-        try:
-            if self._conn is None:
-                with instrumention("connection_initiated", tags=self.tags()):
-                    self._conn = self.connect_impl()
-            with instrumention("query", tags=self.tags({"query": query})):
-                cursor = self.execute_impl(self._conn, *query)
-        except self.connectivity_exceptions as e:
-            self.safely_disconnect()
-            raise
+    def execute(self, *query, write=False, rowcount=False, result_handler=None, watermark=None, **kwargs):
+        """
+        Connect to the database (if necessary) and execute a query.
+
+        ``result_handler``, when given, is called with the rows, the columns and the tags of
+        the ``query`` event, within that event, and its return value is returned.
+        ``watermark``, when given, is sent along with the query according to ``WATERMARK_TRANSPORT``.
+        """
+        if result_handler is not None:
+            return self._run(
+                self.execute_impl, *query, tags={"query": query}, watermark=watermark,
+                result_handler=lambda cursor, tags: result_handler(*self.fetch(cursor), tags)
+                )
+
+        cursor = self._run(self.execute_impl, *query, tags={"query": query}, watermark=watermark)
 
         if write:
             return self.lexicon.row_ids(cursor, kwargs['primary_key'])
+        if rowcount:
+            return cursor.rowcount
+        return self.fetch(cursor)
+
+    def fetch(self, cursor):
         if cursor.description:
             return cursor.fetchall(), self.columns(cursor)
         return None, None
 
+    def executemany(self, query, params, watermark=None):
+        """Execute a query once per set of parameters and return the number of affected rows."""
+        return self._run(self.executemany_impl, query, params, tags={"query": (query,)}, watermark=watermark).rowcount
+
+    def copy(self, query, data, watermark=None):
+        """Stream CSV ``data`` to a ``COPY ... FROM STDIN`` query and return the number of rows copied."""
+        return self._run(self.copy_impl, query, data, tags={"query": (query,)}, watermark=watermark).rowcount
+
+    def execute_iter(self, *query, chunksize=10000, watermark=None):
+        """
+        Execute a query on a server-side cursor when the database supports it and return a
+        generator of ``(rows, columns)`` chunks of at most ``chunksize`` rows. The query is run,
+        and retried on failure, before the generator is returned; errors while reading rows are
+        raised during iteration and are not retried. The cursor, and the connection when it is
+        dedicated to the stream, are held until the generator is closed.
+        """
+        conn = None
+        if self.dedicated_stream_connection:
+            with instrumention("connection_initiated", tags=self.tags()):
+                conn = self.connect_impl()
+        try:
+            cursor = self._run(self.stream_impl, *query, tags={"query": query}, conn=conn, watermark=watermark)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            raise
+        return self.iter_cursor(cursor, chunksize, conn=conn)
+
+    def iter_cursor(self, cursor, chunksize, conn=None):
+        try:
+            columns = None
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if columns is None:
+                    columns = self.columns(cursor)
+                if not rows:
+                    break
+                yield rows, columns
+        finally:
+            # Closing an unbuffered cursor reads all its remaining rows:
+            # a dedicated connection is closed instead, which drops them.
+            if conn is not None:
+                conn.close()
+            else:
+                cursor.close()
+
+    def execute_prepared(self, cursor, sql, params=None):
+        """
+        Executes a query with the statement prepared for its template on the current
+        connection, preparing it first when needed. At most ``PREPARED_STATEMENTS_CACHE_SIZE``
+        statements are kept per connection, the least recently used are deallocated.
+
+        :returns: ``False`` when the query cannot be prepared and has not been executed.
+        """
+        statement = self.lexicon.statement_template(sql, params)
+        if statement is None:
+            return False
+        template, names, comment = statement
+        name = self._statements.get(template)
+        if name is False:
+            return False
+        if name is None:
+            self._statement_count += 1
+            name = 'jardin_%s' % self._statement_count
+            try:
+                cursor.execute(self.lexicon.prepare_statement(name, template))
+            except self.statement_exceptions:
+                self._statements[template] = False
+                return False
+            self._statements[template] = name
+            while len(self._statements) > config.PREPARED_STATEMENTS_CACHE_SIZE:
+                evicted = self._statements.popitem(last=False)[1]
+                if evicted:
+                    try:
+                        cursor.execute(self.lexicon.deallocate_statement(evicted))
+                    except self.statement_exceptions:
+                        pass
+        else:
+            self._statements.move_to_end(template)
+        try:
+            cursor.execute(self.lexicon.execute_statement(name, names, comment), params)
+        except self.statement_exceptions:
+            # e.g. the plan of a statement cannot change after its table was altered.
+            # Errors in the query itself are raised again when it is run as is.
+            del self._statements[template]
+            try:
+                cursor.execute(self.lexicon.deallocate_statement(name))
+            except self.statement_exceptions:
+                pass
+            return False
+        return True
+
+    def stream_impl(self, conn, *query):
+        """Execute a query and return a cursor to fetch its results incrementally."""
+        return self.execute_impl(conn, *query)
+
+    def executemany_impl(self, conn, query, params):
+        cursor = conn.cursor()
+        cursor.executemany(query, params)
+        return cursor
+
+    def copy_impl(self, conn, query, data):
+        raise NotImplementedError('COPY is not supported by %s' % self.db_config.scheme)
+
+    def _run(self, impl, *args, tags=None, conn=None, result_handler=None, watermark=None):
+        try:
+            if conn is None:
+                if self._conn is None:
+                    with instrumention("connection_initiated", tags=self.tags()):
+                        self._conn = self.connect_impl()
+                conn = self._conn
+            if watermark:
+                tags = dict(tags or {}, watermark=watermark)
+            if watermark is not None and config.WATERMARK_TRANSPORT == 'session' and conn is self._conn:
+                self.set_session_watermark(conn, watermark)
+            with instrumention("query", tags=self.tags(tags)) as event_tags:
+                result = impl(conn, *args)
+                if result_handler is not None:
+                    return result_handler(result, event_tags)
+                return result
+        except self.connectivity_exceptions as e:
+            self.safely_disconnect()
+            raise
+
+    def set_session_watermark(self, conn, watermark):
+        """
+        Sets the watermark of the connection's session, when it differs from the one already set.
+        An empty ``watermark`` resets it, so that a previous call site does not stick to the session.
+        """
+        watermark = watermark or None
+        if watermark == self._session_watermark:
+            return
+        query = self.lexicon.session_watermark_query(watermark)
+        if query is None:
+            return
+        conn.cursor().execute(*query)
+        self._session_watermark = watermark
+
     def safely_disconnect(self):
         exceptions_to_swallow = self.connectivity_exceptions + (OSError,)
         try:
@@ -103,6 +262,9 @@ class BaseClient(ABC):
         finally:
             # This will prompt execute to reconnect the next time it is called
             self._conn = None
+            # Prepared statements and session settings do not outlive their connection
+            self._statements = collections.OrderedDict()
+            self._session_watermark = None
 
     def columns(self, cursor):
         cursor_desc = cursor.description
@@ -6,6 +6,10 @@ class BaseLexicon(object):
     @staticmethod
     def table_schema_query(table_name): pass
 
+    @staticmethod
+    def all_tables_schema_query():
+        raise NotImplementedError('Schema preloading is not supported by this database')
+
     @staticmethod
     def table_name_default(row): pass
 
@@ -20,6 +24,10 @@ class BaseLexicon(object):
             values += ['%s = %s' % field_ext]
         return ', '.join(values)
 
+    @staticmethod
+    def upsert_clause(conflict, update, primary_key):
+        raise NotImplementedError('Upserts are not supported by this database')
+
     @staticmethod
     def row_ids(cursor, primary_key): pass
 
@@ -32,5 +40,53 @@ class BaseLexicon(object):
         return args
 
     @staticmethod
-    def standardize_interpolators(sql, params):
-        return re.sub(r'\{(\w+?)\}', r'%(\1)s', sql), params
\ No newline at end of file
+    def session_watermark_query(watermark):
+        """
+        Returns the query, as ``(sql, params)``, setting the watermark of the session, or resetting
+        it when ``watermark`` is empty, or ``None`` when the database has no such setting.
+        """
+        return None
+
+    @staticmethod
+    def statement_template(sql, params):
+        """
+        Splits a query into the template of a prepared statement, the names of the
+        parameters it takes in order and a trailing comment, e.g. the watermark.
+
+        :returns: ``(template, names, comment)``, or ``None`` when the query cannot be prepared.
+        """
+        return None
+
+    @staticmethod
+    def prepare_statement(name, template):
+        raise NotImplementedError('Prepared statements are not supported by this database')
+
+    @staticmethod
+    def execute_statement(name, names, comment):
+        raise NotImplementedError('Prepared statements are not supported by this database')
+
+    @staticmethod
+    def deallocate_statement(name):
+        raise NotImplementedError('Prepared statements are not supported by this database')
+
+    @staticmethod
+    def parse_interpolators(sql):
+        """
+        Rewrites ``{name}`` interpolators of a raw query to ``%(name)s``.
+
+        :returns: ``(sql, names)``, where ``names`` are the parameters the query takes
+            in order, or ``None`` when they are bound by name.
+        """
+        return re.sub(r'\{(\w+?)\}', r'%(\1)s', sql), None
+
+    @staticmethod
+    def bind_interpolators(names, params):
+        """
+        Returns the parameters of a query parsed by ``parse_interpolators``.
+        """
+        return params
+
+    @classmethod
+    def standardize_interpolators(cls, sql, params):
+        sql, names = cls.parse_interpolators(sql)
+        return sql, cls.bind_interpolators(names, params)
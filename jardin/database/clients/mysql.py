@@ -1,4 +1,5 @@
 import pymysql
+import pymysql.cursors
 
 from jardin.database.base_client import BaseClient
 from jardin.database.base_lexicon import BaseLexicon
@@ -10,10 +11,25 @@ class Lexicon(BaseLexicon):
     def table_schema_query(table_name):
         return "SHOW COLUMNS FROM %s;" % table_name
 
+    @staticmethod
+    def all_tables_schema_query():
+        return "SELECT TABLE_NAME AS table_name, COLUMN_NAME AS Field, " \
+            "COLUMN_DEFAULT AS `Default`, COLUMN_TYPE AS Type " \
+            "FROM information_schema.columns WHERE TABLE_SCHEMA = DATABASE() " \
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION;"
+
     @staticmethod
     def column_info(row):
         return row['Field'], row['Default'], row['Type']
 
+    @staticmethod
+    def upsert_clause(conflict, update, primary_key):
+        # MySQL resolves conflicts on any unique key. LAST_INSERT_ID(pk) makes
+        # the id of an updated row available to row_ids.
+        updates = ['%s = LAST_INSERT_ID(%s)' % (primary_key, primary_key)]
+        updates += ['%s = VALUES(%s)' % (c, c) for c in update]
+        return 'ON DUPLICATE KEY UPDATE ' + ', '.join(updates)
+
     @staticmethod
     def row_ids(cursor, primary_key):
         cursor.execute('SELECT LAST_INSERT_ID();')
@@ -29,6 +45,8 @@ class DatabaseClient(BaseClient):
     lexicon = Lexicon
     retryable_exceptions = (pymysql.InterfaceError, pymysql.OperationalError)
     connectivity_exceptions = (pymysql.InterfaceError, pymysql.OperationalError)
+    # An unbuffered cursor blocks its connection until all rows are read
+    dedicated_stream_connection = True
 
     def connect_impl(self):
         kwargs = self.default_connect_kwargs.copy()
@@ -39,3 +57,8 @@ class DatabaseClient(BaseClient):
         cursor = conn.cursor()
         cursor.execute(*query)
         return cursor
+
+    def stream_impl(self, conn, *query):
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(*query)
+        return cursor
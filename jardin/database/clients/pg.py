@@ -1,3 +1,7 @@
+import io
+import re
+import uuid
+
 import psycopg2 as pg
 from psycopg2 import extras
 
@@ -6,17 +10,32 @@ from jardin.database.base_lexicon import BaseLexicon
 import jardin.config as config
 
 
+PREPARABLE_QUERY = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|VALUES|WITH)\b', re.IGNORECASE)
+PLACEHOLDER = re.compile(r'%\((\w+)\)s|%%')
+TRAILING_COMMENT = re.compile(r'\s*(/\*[^*]*\*/)\s*$')
+
+
 class Lexicon(BaseLexicon):
 
     @staticmethod
     def table_schema_query(table_name):
-        return "SELECT column_name, column_default, data_type FROM " \
+        return "SELECT column_name, column_default, data_type, udt_schema, udt_name FROM " \
             "information_schema.columns WHERE " \
             "table_name=%(table_name)s AND table_schema='public';"
 
+    @staticmethod
+    def all_tables_schema_query():
+        return "SELECT table_name, column_name, column_default, data_type, udt_schema, udt_name FROM " \
+            "information_schema.columns WHERE table_schema='public' " \
+            "ORDER BY table_name, ordinal_position;"
+
     @staticmethod
     def column_info(row):
-        return row['column_name'], row['column_default'], row['data_type']
+        sql_type = row['data_type']
+        if sql_type == 'USER-DEFINED' and row.get('udt_name'):
+            # e.g. enums, named after their type so that values can be cast to it
+            sql_type = '"%s"."%s"' % (row['udt_schema'], row['udt_name'])
+        return row['column_name'], row['column_default'], sql_type
 
     @staticmethod
     def update_values(fields, value_extrapolators):
@@ -33,10 +52,68 @@ class Lexicon(BaseLexicon):
             )
         return result
 
+    @staticmethod
+    def upsert_clause(conflict, update, primary_key):
+        clause = 'ON CONFLICT (%s) DO' % ', '.join(conflict)
+        if not update:
+            return clause + ' NOTHING'
+        return clause + ' UPDATE SET ' + ', '.join(['%s = EXCLUDED.%s' % (c, c) for c in update])
+
+    @staticmethod
+    def session_watermark_query(watermark):
+        if not watermark:
+            return ('RESET application_name', None)
+        # application_name is truncated to 63 bytes, keep the end of the call site
+        application_name = watermark.encode('utf-8')[-63:].decode('utf-8', errors='ignore')
+        return ('SET application_name = %(application_name)s', {'application_name': application_name})
+
+    @staticmethod
+    def statement_template(sql, params):
+        if not isinstance(params, dict) or not PREPARABLE_QUERY.match(sql):
+            return None
+        # psycopg2 renders tuples as (v1, v2, ...) lists, which cannot be a single parameter
+        if any(isinstance(v, tuple) for v in params.values()):
+            return None
+        comment = ''
+        match = TRAILING_COMMENT.search(sql)
+        if match:
+            comment = match.group(1)
+            sql = sql[:match.start()]
+        names = []
+
+        def placeholder(match):
+            name = match.group(1)
+            if name is None:
+                return '%'
+            if name not in names:
+                names.append(name)
+            return '$%s' % (names.index(name) + 1)
+
+        return PLACEHOLDER.sub(placeholder, sql), tuple(names), comment
+
+    @staticmethod
+    def prepare_statement(name, template):
+        return 'PREPARE %s AS %s' % (name, template)
+
+    @staticmethod
+    def execute_statement(name, names, comment):
+        query = 'EXECUTE ' + name
+        if names:
+            query += ' (' + ', '.join(['%(' + n + ')s' for n in names]) + ')'
+        if comment:
+            query += ' ' + comment
+        return query
+
+    @staticmethod
+    def deallocate_statement(name):
+        return 'DEALLOCATE ' + name
+
     @staticmethod
     def row_ids(cursor, primary_key):
-        row_ids = cursor.fetchall()
-        return [r[primary_key] for r in row_ids]
+        if cursor.description is None:
+            return []
+        index = [c[0] for c in cursor.description].index(primary_key)
+        return [r[index] for r in cursor.fetchall()]
 
 
 class DatabaseClient(BaseClient):
@@ -44,6 +121,7 @@ class DatabaseClient(BaseClient):
     lexicon = Lexicon
     retryable_exceptions = (pg.OperationalError, pg.InterfaceError, pg.extensions.QueryCanceledError)
     connectivity_exceptions = (pg.OperationalError, pg.InterfaceError)
+    statement_exceptions = (pg.ProgrammingError, pg.DataError, pg.NotSupportedError)
 
     def connect_impl(self):
         kwargs = self.default_connect_kwargs.copy()
@@ -54,6 +132,23 @@ class DatabaseClient(BaseClient):
         return conn
 
     def execute_impl(self, conn, *query):
-        cursor = conn.cursor(cursor_factory=pg.extras.RealDictCursor)
+        cursor = conn.cursor()
+        if config.PREPARED_STATEMENTS and conn is self._conn and self.execute_prepared(cursor, *query):
+            return cursor
         cursor.execute(*query)
         return cursor
+
+    def stream_impl(self, conn, *query):
+        # Named cursors fetch rows from the server in chunks. WITH HOLD lets them
+        # live outside of a transaction, since connections are in autocommit mode.
+        cursor = conn.cursor(
+            'jardin_%s' % uuid.uuid4().hex,
+            withhold=True
+            )
+        cursor.execute(*query)
+        return cursor
+
+    def copy_impl(self, conn, query, data):
+        cursor = conn.cursor()
+        cursor.copy_expert(query, io.StringIO(data))
+        return cursor
@@ -13,20 +13,31 @@ class Lexicon(PGLexicon):
     def extrapolator(_):
         return '%s'
 
+    @staticmethod
+    def session_watermark_query(watermark):
+        return None
+
+    @staticmethod
+    def upsert_clause(conflict, update, primary_key):
+        raise NotImplementedError('Upserts are not supported by Snowflake, use MERGE')
+
     @staticmethod
     def format_args(args):
         return args.values()
 
     @staticmethod
-    def standardize_interpolators(sql, params):
-        sql, params = super(
-            Lexicon, Lexicon).standardize_interpolators(sql, params)
+    def parse_interpolators(sql):
+        sql, _ = PGLexicon.parse_interpolators(sql)
         param_names = re.findall(r'\%\((\w+)\)s', sql)
         if len(param_names):
-            sql = re.sub(r'\%\(\w+\)s', '%s', sql)
-            if isinstance(params, dict):
-                params = list(map(lambda x: params[x], param_names))
-        return sql, params
+            return re.sub(r'\%\(\w+\)s', '%s', sql), param_names
+        return sql, None
+
+    @staticmethod
+    def bind_interpolators(names, params):
+        if names and isinstance(params, dict):
+            return [params[x] for x in names]
+        return params
 
 
 class DatabaseClient(BaseClient):
@@ -10,6 +10,12 @@ class Lexicon(BaseLexicon):
     def table_schema_query(table_name):
         return "pragma table_info(%s);" % table_name
 
+    @staticmethod
+    def all_tables_schema_query():
+        return "SELECT m.name AS table_name, p.name AS name, p.dflt_value AS dflt_value, p.type AS type " \
+            "FROM sqlite_master m JOIN pragma_table_info(m.name) p " \
+            "WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' ORDER BY m.name, p.cid;"
+
     @staticmethod
     def column_info(row):
         return row['name'], row['dflt_value'], row['type']
@@ -18,6 +24,13 @@ class Lexicon(BaseLexicon):
     def extrapolator(field):
         return ':%s' % field
 
+    @staticmethod
+    def upsert_clause(conflict, update, primary_key):
+        clause = 'ON CONFLICT (%s) DO' % ', '.join(conflict)
+        if not update:
+            return clause + ' NOTHING'
+        return clause + ' UPDATE SET ' + ', '.join(['%s = EXCLUDED.%s' % (c, c) for c in update])
+
     @staticmethod
     def row_ids(cursor, primary_key):
         return [cursor.lastrowid]
@@ -37,3 +50,16 @@ class DatabaseClient(BaseClient):
         cursor = conn.cursor()
         cursor.execute(*query)
         return cursor
+
+    def executemany_impl(self, conn, query, params):
+        # In autocommit, each row would be committed in its own transaction
+        if conn.in_transaction:
+            return super(DatabaseClient, self).executemany_impl(conn, query, params)
+        conn.execute('BEGIN')
+        try:
+            cursor = super(DatabaseClient, self).executemany_impl(conn, query, params)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return cursor
@@ -4,13 +4,19 @@ import os
 
 from jardin import config as config
 from jardin.instrumentation.event import Event, EventExceptionInformation
+from jardin.instrumentation.instrumenter import instrumention
 from jardin.query_builders import \
     SelectQueryBuilder, \
     InsertQueryBuilder, \
+    UpsertQueryBuilder, \
+    BulkInsertQueryBuilder, \
+    BulkUpdateQueryBuilder, \
     UpdateQueryBuilder, \
     DeleteQueryBuilder, \
     RawQueryBuilder
 from jardin.cache_stores import cached
+from jardin.tools import chunks
+from jardin.database.results import build_frame, build_table, arrow_backed, compact_frame, memory_usage
 
 
 def set_defaults(func):
@@ -39,19 +45,41 @@ class DatabaseAdapter(object):
         self.model_metadata = model_metadata
 
     @set_defaults
-    def select(self, **kwargs):
-        query = SelectQueryBuilder(**kwargs).query
+    def select(self, output=None, dtype_backend=None, compact=None, **kwargs):
+        query_builder = SelectQueryBuilder(**kwargs)
+        query = query_builder.query
         config.logger.debug(query)
-        results, columns = self._execute(*query, write=False)
-        if results is None and columns is None:
-            return None
-        return pandas.DataFrame.from_records(results, columns=columns, coerce_float=True)
+        return self.fetch_frame(
+            query, watermark=self.watermark(query_builder), output=output,
+            dtype_backend=self.dtype_backend(dtype_backend), compact=compact
+            )
+
+    @set_defaults
+    def select_iter(self, chunksize=10000, output=None, dtype_backend=None, compact=None, **kwargs):
+        query_builder = SelectQueryBuilder(**kwargs)
+        query = query_builder.query
+        config.logger.debug(query)
+        watermark = self.watermark(query_builder)
+        dtype_backend = self.dtype_backend(dtype_backend)
+        compact = self.compact(compact, output=output, dtype_backend=dtype_backend)
+        for results, columns in self._execute(*query, client_method='execute_iter', chunksize=chunksize, watermark=watermark):
+            yield self.to_frame(results, columns, output=output, dtype_backend=dtype_backend, compact=compact)
 
     @set_defaults
     def write(self, query_builder, **kwargs):
-        query = query_builder(**kwargs).query
+        query_builder = query_builder(**kwargs)
+        query = query_builder.query
         config.logger.debug(query)
-        returning_ids = self._execute(*query, write=True, **kwargs)
+        watermark = self.watermark(query_builder)
+        if query_builder.returning:
+            results, columns = self._execute(*query, write=False, watermark=watermark)
+            if len(results) > 0:
+                return self.to_frame(results, columns)
+            return None
+        if not kwargs.get('returning', True):
+            self._execute(*query, rowcount=True, watermark=watermark)
+            return None
+        returning_ids = self._execute(*query, write=True, watermark=watermark, **kwargs)
         if len(returning_ids) > 0:
             return self.select(where={kwargs['primary_key']: returning_ids})
         return None
@@ -62,23 +90,177 @@ class DatabaseAdapter(object):
     def update(self, **kwargs):
         return self.write(UpdateQueryBuilder, **kwargs)
 
+    @set_defaults
+    def upsert(self, values, chunksize=1000, **kwargs):
+        conflict = kwargs['conflict']
+        if not isinstance(values, pandas.DataFrame):
+            values = pandas.DataFrame([values] if isinstance(values, dict) else list(values))
+        if len(values) == 0:
+            return None
+        # A statement cannot update the same row twice, and a row in two chunks would be written twice
+        values = values.drop_duplicates(subset=conflict, keep='last')
+        # Without RETURNING, only the id of the last row is known: rows are selected back by their conflict keys
+        reselect = kwargs.get('returning', True) and not UpsertQueryBuilder(**kwargs).returning
+        results = []
+        for chunk in chunks(values, chunksize):
+            if reselect:
+                self.write(UpsertQueryBuilder, values=chunk, **dict(kwargs, returning=False))
+                result = self.select_conflicting(chunk, conflict)
+            else:
+                result = self.write(UpsertQueryBuilder, values=chunk, **kwargs)
+            if result is not None:
+                results += [result]
+        if len(results) == 0:
+            return None
+        return pandas.concat(results, ignore_index=True)
+
+    def select_conflicting(self, values, conflict):
+        """
+        Selects the rows matching the ``conflict`` columns of ``values``.
+        """
+        results = self.select(where={c: values[c].drop_duplicates().tolist() for c in conflict})
+        if results is None or len(results) == 0:
+            return None
+        if len(conflict) > 1:
+            keys = set(values[conflict].itertuples(index=False, name=None))
+            mask = [key in keys for key in results[conflict].itertuples(index=False, name=None)]
+            results = results[mask].reset_index(drop=True)
+        return results
+
+    def bulk_insert(self, **kwargs):
+        return self.bulk_write('bulk_insert', BulkInsertQueryBuilder, **kwargs)
+
+    def bulk_update(self, **kwargs):
+        return self.bulk_write('bulk_update', BulkUpdateQueryBuilder, **kwargs)
+
+    @set_defaults
+    def bulk_write(self, event_name, query_builder, values, chunksize=1000, **kwargs):
+        tags = {"db_name": self.client_provider.name, "table_name": self.model_metadata['table_name']}
+        monotonic_start = time.monotonic()
+        rows = 0
+        with instrumention(event_name, tags=tags):
+            for chunk in chunks(values, chunksize):
+                builder = query_builder(values=chunk, **kwargs)
+                query = builder.query
+                tags["method"] = builder.method
+                config.logger.debug(query[0])
+                watermark = self.watermark(builder)
+                if builder.method == 'copy':
+                    self._execute(*query, client_method='copy', watermark=watermark)
+                elif builder.method == 'executemany':
+                    self._execute(*query, client_method='executemany', watermark=watermark)
+                else:
+                    self._execute(*query, rowcount=True, watermark=watermark)
+                rows += len(chunk)
+            duration = time.monotonic() - monotonic_start
+            tags["rows"] = rows
+            tags["rows_per_second"] = rows / duration if duration > 0 else None
+        return rows
+
     @set_defaults
     def delete(self, **kwargs):
-        query = DeleteQueryBuilder(**kwargs).query
+        query_builder = DeleteQueryBuilder(**kwargs)
+        query = query_builder.query
         config.logger.debug(query)
-        self._execute(*query, write=False)
+        self._execute(*query, write=False, watermark=self.watermark(query_builder))
 
     @set_defaults
     @cached
-    def raw_query(self, **kwargs):
-        query = RawQueryBuilder(**kwargs).query
+    def raw_query(self, dtype_backend=None, compact=None, **kwargs):
+        query_builder = RawQueryBuilder(**kwargs)
+        query = query_builder.query
         config.logger.debug(query)
-        results, columns = self._execute(*query, write=False)
+        return self.fetch_frame(
+            query, watermark=self.watermark(query_builder), dtype_backend=self.dtype_backend(dtype_backend), compact=compact
+            )
+
+    @set_defaults
+    def raw_query_iter(self, chunksize=10000, dtype_backend=None, compact=None, **kwargs):
+        query_builder = RawQueryBuilder(**kwargs)
+        query = query_builder.query
+        config.logger.debug(query)
+        watermark = self.watermark(query_builder)
+        dtype_backend = self.dtype_backend(dtype_backend)
+        compact = self.compact(compact, dtype_backend=dtype_backend)
+        for results, columns in self._execute(*query, client_method='execute_iter', chunksize=chunksize, watermark=watermark):
+            yield self.to_frame(results, columns, dtype_backend=dtype_backend, compact=compact)
+
+    def fetch_frame(self, query, compact=None, watermark=None, **kwargs):
+        """
+        Executes a query and builds its results. Compact results are built within the
+        ``query`` event, which is tagged with their ``memory_usage`` in bytes.
+        """
+        if not self.compact(compact, **kwargs):
+            results, columns = self._execute(*query, write=False, watermark=watermark)
+            return self.to_frame(results, columns, **kwargs)
+
+        def result_handler(results, columns, tags):
+            result = self.to_frame(results, columns, compact=True, **kwargs)
+            if result is not None:
+                tags['memory_usage'] = memory_usage(result)
+            return result
+
+        return self._execute(*query, write=False, result_handler=result_handler, watermark=watermark)
+
+    @staticmethod
+    def compact(compact=None, output=None, dtype_backend='numpy'):
+        """
+        Returns whether results are compacted. Arrow results never are: ``COMPACT`` does not
+        apply to them and ``compact=True`` raises a ``ValueError``.
+        """
+        arrow = output == 'arrow' or dtype_backend == 'pyarrow'
+        if compact is None:
+            return config.COMPACT and not arrow
+        if compact and arrow:
+            raise ValueError('Arrow results cannot be compacted')
+        return compact
+
+    @staticmethod
+    def dtype_backend(dtype_backend=None):
+        """
+        Returns the dtype backend of results, raising a ``ValueError`` for ``'pyarrow'`` before pandas 1.5.
+        """
+        dtype_backend = dtype_backend or config.DTYPE_BACKEND
+        if dtype_backend == 'pyarrow' and getattr(pandas, 'ArrowDtype', None) is None:
+            raise ValueError("dtype_backend='pyarrow' requires pandas 1.5 or later, use output='arrow' instead")
+        return dtype_backend
+
+    @staticmethod
+    def watermark(query_builder):
+        """
+        Returns the watermark the client sends along with the query, or ``None`` when it is
+        written in the query itself, according to ``WATERMARK_TRANSPORT``: ``'comment'`` writes it
+        in a comment, ``'session'`` sets it as the session's ``application_name`` on PostgreSQL,
+        and ``'instrumentation'`` only tags the ``query`` event with it. With ``'session'``, an
+        empty watermark is returned as ``''`` so that the client resets the previous one.
+        """
+        transport = config.WATERMARK_TRANSPORT
+        if transport == 'comment':
+            return None
+        if transport not in ('session', 'instrumentation'):
+            raise ValueError("Unknown watermark transport %r, expected 'comment', 'session' or 'instrumentation'" % transport)
+        if transport == 'session':
+            return query_builder.watermark_tag or ''
+        return query_builder.watermark_tag or None
+
+    def to_frame(self, results, columns, output=None, dtype_backend='numpy', compact=False):
+        if output not in (None, 'pandas', 'arrow'):
+            raise ValueError("Unknown output %r, expected 'pandas' or 'arrow'" % output)
+        if dtype_backend not in ('numpy', 'pyarrow'):
+            raise ValueError("Unknown dtype backend %r, expected 'numpy' or 'pyarrow'" % dtype_backend)
         if results is None and columns is None:
             return None
-        return pandas.DataFrame.from_records(results, columns=columns, coerce_float=True)
+        table_schema = (self.model_metadata or {}).get('table_schema')
+        if output == 'arrow':
+            return build_table(results, columns, table_schema)
+        if dtype_backend == 'pyarrow':
+            return arrow_backed(build_table(results, columns, table_schema))
+        df = build_frame(results, columns, table_schema)
+        if compact:
+            df = compact_frame(df)
+        return df
 
-    def _execute(self, *query, **kwargs):
+    def _execute(self, *query, client_method='execute', **kwargs):
         last_exception = None
         while True:
             current_client = self.client_provider.next_client()
@@ -93,7 +275,7 @@ class DatabaseAdapter(object):
                     config.notifier.report_event(Event("query_retry", error=EventExceptionInformation(last_exception), tags=current_client.tags()))
 
                 try:
-                    return current_client.execute(*query, **kwargs)
+                    return getattr(current_client, client_method)(*query, **kwargs)
                 except current_client.retryable_exceptions as e:
                     time.sleep(backoff)
                     backoff *= 2
@@ -112,6 +112,15 @@ class Datasources(object):
             self.log_datasource(name, c.db_config)
             self._clients.active[name] = c
 
+    @classmethod
+    def disconnect_clients(self):
+        """
+        Closes the connections of the current thread's clients, e.g. before the thread exits.
+        """
+        for clients in self._clients.all.values():
+            for client in clients:
+                client.safely_disconnect()
+
     @classmethod
     def non_banned_clients(self, name):
         return [client for client in self._clients.all.get(name, []) if not client.is_banned]
@@ -0,0 +1,229 @@
+import re
+from operator import itemgetter
+
+import numpy as np
+import pandas
+import pyarrow as pa
+
+import jardin.config as config
+
+
+INTEGER_TYPE = re.compile(r'^((tiny|small|medium|big)?int(eger)?\d?|(small|big)?serial)\b')
+FLOAT_TYPE = re.compile(r'^(real|float\d?|double( precision)?|numeric|decimal)\b')
+BOOLEAN_TYPE = re.compile(r'^bool(ean)?$')
+ENUM_TYPE = re.compile(r"^enum\((.*)\)$")
+INT64_MIN, INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+# Text columns with at most this ratio of distinct values to rows become categories.
+CATEGORY_MAX_RATIO = 0.5
+
+
+def column_dtype(sql_type):
+    """
+    Maps a column type, as returned by the lexicon's ``column_info``, to the
+    dtype its values are converted to.
+
+    :param sql_type: SQL type of the column.
+    :type sql_type: str
+    :returns: One of ``'int'``, ``'float'``, ``'bool'``, a ``CategoricalDtype``
+        or ``None`` when the dtype should be inferred from the values.
+    """
+    if not isinstance(sql_type, str):
+        return None
+    sql_type = sql_type.strip().lower()
+    if INTEGER_TYPE.match(sql_type):
+        return 'int'
+    if FLOAT_TYPE.match(sql_type):
+        return 'float'
+    if BOOLEAN_TYPE.match(sql_type):
+        return 'bool'
+    enum = ENUM_TYPE.match(sql_type)
+    if enum:
+        labels = re.findall(r"'((?:[^']|'')*)'", enum.group(1))
+        return pandas.CategoricalDtype([label.replace("''", "'") for label in labels])
+    return None
+
+
+def infer_column(values):
+    """
+    Infers the dtype of a column's values as ``DataFrame.from_records(coerce_float=True)`` does.
+    """
+    column = pandas.Series(values)
+    if column.dtype == object and pandas.api.types.infer_dtype(column, skipna=True) == 'decimal':
+        column = column.astype(np.float64)
+    return column
+
+
+def build_column(values, dtype=None):
+    """
+    Builds a column from a list of values.
+
+    Values are only converted to the dtype of the column when no information is
+    lost, otherwise their dtype is inferred as by ``DataFrame.from_records(coerce_float=True)``.
+    """
+    if dtype is None:
+        return infer_column(values)
+    if dtype == 'int':
+        ints = np.array(values)
+        if ints.ndim == 1 and ints.dtype.kind in 'ib':
+            return ints.astype(np.int64, copy=False)
+        if any(isinstance(v, int) and not INT64_MIN <= v <= INT64_MAX for v in values):
+            # Floats would round them, e.g. bigint unsigned above the int64 range
+            column = pandas.Series(values)
+            return column if column.dtype.kind in 'uO' else pandas.Series(values, dtype=object)
+        if config.NULLABLE_INTEGERS:
+            try:
+                return pandas.array(values, dtype='Int64')
+            except (TypeError, ValueError, OverflowError):
+                pass
+        dtype = 'float'
+    objects = pandas.Series(values, dtype=object)
+    if dtype == 'float':
+        try:
+            return objects.astype(np.float64)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    elif dtype == 'bool':
+        if not objects.isnull().any():
+            return objects.astype(bool)
+    elif isinstance(dtype, pandas.CategoricalDtype):
+        column = pandas.Categorical(objects, dtype=dtype)
+        # Values missing from the categories would become NaN
+        if column.isna().sum() == objects.isna().sum():
+            return column
+    return infer_column(values)
+
+
+def build_arrow_column(values, dtype=None):
+    """
+    Builds an Arrow array from a list of values.
+
+    Values that cannot be converted to the dtype of the column are inferred by Arrow.
+    """
+    try:
+        if dtype == 'int':
+            return pa.array(values, type=pa.int64(), from_pandas=True)
+        if dtype == 'float':
+            return pa.array(values, type=pa.float64(), from_pandas=True)
+        if dtype == 'bool':
+            return pa.array(values, type=pa.bool_(), from_pandas=True)
+    except (TypeError, ValueError, OverflowError, pa.ArrowException):
+        pass
+    if isinstance(dtype, pandas.CategoricalDtype):
+        return pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode()
+    return pa.array(values, from_pandas=True)
+
+
+def transpose(rows, columns):
+    """
+    Returns the values of each column of ``rows``, as lists.
+    """
+    if len(rows) == 0:
+        return [[] for _ in columns]
+    if isinstance(rows[0], dict):
+        return [[row.get(column) for row in rows] for column in columns]
+    return [list(map(itemgetter(i), rows)) for i in range(len(columns))]
+
+
+def build_table(rows, columns, table_schema=None):
+    """
+    Builds a ``pyarrow.Table`` from the rows returned by a cursor, without going through pandas.
+
+    :param rows: Rows as tuples.
+    :type rows: list
+    :param columns: Column names.
+    :type columns: list
+    :param table_schema: Table schema of the model, as returned by ``Model.table_schema``.
+    :type table_schema: dict
+    :returns: pyarrow.Table
+    """
+    table_schema = table_schema or {}
+    values = transpose(rows, columns)
+    arrays = []
+    for i, column in enumerate(columns):
+        dtype = column_dtype(table_schema.get(column, {}).get('type'))
+        arrays += [build_arrow_column(values[i], dtype)]
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+
+def arrow_backed(data):
+    """
+    Converts a ``pyarrow.Table``, or a DataFrame, to a DataFrame backed by ``pandas.ArrowDtype`` columns.
+    """
+    if isinstance(data, pandas.DataFrame):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+    return data.to_pandas(types_mapper=pandas.ArrowDtype)
+
+
+def build_frame(rows, columns, table_schema=None):
+    """
+    Builds a DataFrame from the rows returned by a cursor.
+
+    Rows are transposed straight into one array per column, typed from the
+    table schema when the column belongs to it, instead of inferring the type
+    of every column.
+
+    :param rows: Rows as tuples.
+    :type rows: list
+    :param columns: Column names.
+    :type columns: list
+    :param table_schema: Table schema of the model, as returned by ``Model.table_schema``.
+    :type table_schema: dict
+    :returns: pandas.DataFrame
+    """
+    if len(rows) == 0 or not isinstance(rows[0], (tuple, list)):
+        return pandas.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    table_schema = table_schema or {}
+    dtypes = [column_dtype(table_schema.get(column, {}).get('type')) for column in columns]
+    if all(dtype is None for dtype in dtypes):
+        return pandas.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    values = transpose(rows, columns)
+    arrays = {}
+    for i, dtype in enumerate(dtypes):
+        arrays[i] = build_column(values[i], dtype)
+        values[i] = None
+    df = pandas.DataFrame(arrays)
+    df.columns = columns
+    return df
+
+
+def compact_frame(df):
+    """
+    Reduces the memory footprint of a DataFrame in place, without losing information:
+    low-cardinality text columns become categories, integer columns are downcast
+    to the smallest integer dtype holding their values and float columns to
+    ``float32`` when it represents all of their values exactly.
+
+    :param df: DataFrame to compact.
+    :type df: pandas.DataFrame
+    :returns: pandas.DataFrame
+    """
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        dtype = column.dtype
+        if dtype == object:
+            if len(column) > 0 and pandas.api.types.infer_dtype(column, skipna=True) == 'string' and \
+                    column.nunique() <= CATEGORY_MAX_RATIO * len(column):
+                column = column.astype('category')
+        elif dtype.kind in 'iu':
+            column = pandas.to_numeric(column, downcast='unsigned' if dtype.kind == 'u' else 'integer')
+        elif dtype == np.float64:
+            downcast = column.astype(np.float32)
+            if ((downcast.astype(np.float64) == column) | column.isnull()).all():
+                column = downcast
+        if column.dtype != dtype:
+            if hasattr(df, 'isetitem'):
+                df.isetitem(i, column)
+            else:
+                # Before pandas 1.5, assigning by position replaces the column and its dtype
+                df.iloc[:, i] = column
+    return df
+
+
+def memory_usage(data):
+    """
+    Returns the number of bytes held by a DataFrame, including Python objects, or by a ``pyarrow.Table``.
+    """
+    if isinstance(data, pa.Table):
+        return data.nbytes
+    return int(data.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import threading
+
+import jardin.config as config
+from jardin.database.client_provider import ClientProvider
+from jardin.database.database_adapter import DatabaseAdapter
+
+
+class SchemaCache(object):
+    """
+    Columns of every table of a database, loaded with a single catalog query.
+
+    There is one cache per database name. Concurrent loads of the same cache are
+    single-flighted: the first thread runs the query, the others wait for its result.
+    """
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.tables = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_name):
+        """
+        Returns the schema cache of the database ``db_name``.
+        """
+        with cls._caches_lock:
+            if db_name not in cls._caches:
+                cls._caches[db_name] = cls(db_name)
+            return cls._caches[db_name]
+
+    def load(self, path=None, fingerprint=None):
+        """
+        Loads the columns of every table, from the file at ``path`` when it was written
+        with the same ``fingerprint``, from the database otherwise. When ``path`` is
+        given, the columns read from the database are written to it.
+
+        :returns: dict of table name to a list of ``(name, default, type)`` tuples.
+        """
+        if path is not None and fingerprint is None:
+            raise ValueError('A fingerprint is required to persist schemas')
+        with self._lock:
+            if self.tables is not None:
+                return self.tables
+            tables = None
+            if path is not None:
+                tables = self.read(path, fingerprint)
+            if tables is None:
+                tables = self.query()
+                if path is not None:
+                    self.write(path, fingerprint, tables)
+            self.tables = tables
+            return tables
+
+    def query(self):
+        client_provider = ClientProvider(self.db_name)
+        lexicon = client_provider.lexicon
+        results = DatabaseAdapter(client_provider, None).raw_query(
+            sql=lexicon.all_tables_schema_query(),
+            dtype_backend='numpy'
+            )
+        tables = {}
+        if results is None:
+            return tables
+        for row in results.to_dict(orient='records'):
+            tables.setdefault(row['table_name'], []).append(tuple(lexicon.column_info(row)))
+        return tables
+
+    @staticmethod
+    def read(path, fingerprint):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('fingerprint') != fingerprint:
+            return None
+        return {table: [tuple(column) for column in columns] for (table, columns) in data['tables'].items()}
+
+    @staticmethod
+    def write(path, fingerprint, tables):
+        # Write to a temporary file first, so that concurrent readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'fingerprint': fingerprint, 'tables': tables}, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            config.logger.warning('Could not write schema cache to %s: %s' % (path, e))
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def columns(self, table_name):
+        """
+        Returns the columns of ``table_name`` as a list of ``(name, default, type)`` tuples,
+        or ``None`` when the cache is not loaded or does not know the table.
+        """
+        tables = self.tables
+        if tables is None:
+            return None
+        return tables.get(table_name)
+
+    def forget(self, table_name):
+        """
+        Drops ``table_name`` from the cache, so that its columns are read again from the database.
+        """
+        with self._lock:
+            if self.tables is not None:
+                self.tables = {t: c for (t, c) in self.tables.items() if t != table_name}
+
+    def clear(self):
+        with self._lock:
+            self.tables = None
+
+
+def preload_schemas(db, path=None, fingerprint=None):
+    """
+    Loads the columns of every table of the database ``db`` with a single catalog query,
+    so that ``Model.table_schema()`` does not query the database for them.
+
+    :param db: Database name from your ``jardin_conf.py``.
+    :type db: string
+    :param path: `optional` File to persist the schemas to, and to read them from on the next start.
+    :type path: string
+    :param fingerprint: Identifies the version of the schema, e.g. the latest migration. Required with ``path``: the file is only read back when it was written with the same fingerprint.
+    :type fingerprint: string
+    :returns: dict of table name to a list of ``(name, default, type)`` tuples.
+    """
+    return SchemaCache.get(db).load(path=path, fingerprint=fingerprint)
@@ -0,0 +1,65 @@
+import fnmatch
+import os
+import threading
+
+from jardin.database.client_provider import ClientProvider
+
+
+class SqlTemplates(object):
+    """
+    SQL files read by raw queries, parsed once per lexicon.
+
+    Templates are keyed by absolute path and lexicon, and read again when the
+    modification time of their file changes.
+    """
+
+    # (sql, names, mtime) indexed by (absolute path, lexicon).
+    _templates = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, filename, lexicon):
+        """
+        Returns the query of the file at ``filename`` parsed by ``lexicon.parse_interpolators``.
+
+        :returns: ``(sql, names)``
+        """
+        path = os.path.abspath(filename)
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, lexicon)
+        template = cls._templates.get(key)
+        if template is None or template[2] != mtime:
+            with open(path) as file:
+                sql, names = lexicon.parse_interpolators(file.read())
+            template = (sql, names, mtime)
+            with cls._lock:
+                cls._templates[key] = template
+        return template[0], template[1]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._templates = {}
+
+
+def preload_queries(db, directory, pattern='*.sql'):
+    """
+    Reads and parses every SQL file under ``directory`` for the database ``db``, so that
+    ``jardin.query(filename=...)`` does not read them again until they change.
+
+    :param db: Database name from your ``jardin_conf.py``.
+    :type db: string
+    :param directory: Directory to look for SQL files in, recursively.
+    :type directory: string
+    :param pattern: Pattern the names of the files match.
+    :type pattern: string
+    :returns: list of the absolute paths of the files loaded.
+    """
+    lexicon = ClientProvider(db).lexicon
+    paths = []
+    for (root, _, filenames) in os.walk(os.path.abspath(directory)):
+        for filename in sorted(fnmatch.filter(filenames, pattern)):
+            path = os.path.join(root, filename)
+            SqlTemplates.get(path, lexicon)
+            paths += [path]
+    return paths
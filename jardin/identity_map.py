@@ -0,0 +1,61 @@
+import threading
+
+import jardin.config as config
+from jardin.instrumentation.event import Event
+
+
+class IdentityMap(object):
+    """
+    Attributes of the records found by primary key during the current session.
+
+    Each thread has its own map, emptied by ``jardin.reset_session()``. Records are
+    keyed by database and table, so that writes through any model on the same table
+    invalidate them.
+    """
+
+    class Session(threading.local):
+        def __init__(self) -> None:
+            # Attributes of the found records indexed by (db name, table name), then by primary key value.
+            self.tables = {}  # type: dict[tuple, dict]
+
+    _session = Session()
+
+    @staticmethod
+    def key(model):
+        return (model.db_names.get('master'), model._table_name())
+
+    @classmethod
+    def get(self, model, id):
+        """
+        Returns a new record of ``model`` with the attributes found for ``id`` during
+        the session, or ``None``. Reports an ``identity_map_hit`` or ``identity_map_miss`` event.
+        """
+        attributes = self._session.tables.get(self.key(model), {}).get(id)
+        tags = {'model': model.__name__, 'table': model._table_name()}
+        if attributes is None:
+            config.notifier.report_event(Event('identity_map_miss', tags=tags))
+            return None
+        config.notifier.report_event(Event('identity_map_hit', tags=tags))
+        return model(**attributes)
+
+    @classmethod
+    def set(self, model, id, record):
+        self._session.tables.setdefault(self.key(model), {})[id] = record.attributes.copy()
+
+    @classmethod
+    def forget(self, model, id):
+        """
+        Forgets the record of ``model`` found for ``id``.
+        """
+        self._session.tables.get(self.key(model), {}).pop(id, None)
+
+    @classmethod
+    def invalidate(self, model):
+        """
+        Forgets the records of ``model``'s table.
+        """
+        self._session.tables.pop(self.key(model), None)
+
+    @classmethod
+    def clear(self):
+        self._session.tables = {}
@@ -12,7 +12,7 @@ def instrumention(event_name, tags=None):
     start_time = time.time()
     exception_info = None
     try:
-        yield
+        yield tags
     except Exception as e:
         exception_info = EventExceptionInformation(e)
         raise
@@ -1,13 +1,19 @@
+from concurrent import futures
 from datetime import datetime
+import functools
+import inspect
+import threading
 import pandas
-import re, inspect
+import re
 import json
 
 import jardin.config as config
 from jardin.database.client_provider import ClientProvider
 from jardin.database.database_adapter import DatabaseAdapter
 from jardin.database.datasources import Datasources
-from jardin.tools import soft_del, classorinstancemethod, stack_marker
+from jardin.database.schema_cache import SchemaCache
+from jardin.identity_map import IdentityMap
+from jardin.tools import soft_del, classorinstancemethod, stack_marker, watermark_marker
 from jardin.query import query
 
 
@@ -16,48 +22,159 @@ class Collection(pandas.DataFrame):
         Base class for collection of records. Inherits from `pandas.DataFrame`.
     """
 
-    def _constructor(self, *args, **kwargs):
-        instance = self.__class__(*args, **kwargs)
-        if hasattr(self, 'model_class'):
-            instance.model_class = self.model_class
-        return instance
+    # Propagated by pandas to the results of operations on the collection, see __finalize__
+    _metadata = ['model_class', '_included']
 
-    def records(self):
+    model_class = None
+    # Relations preloaded with ``includes``, by table name: (collection, {key: positions})
+    _included = None
+
+    @property
+    def _constructor(self):
+        return self.__class__
+
+    def __finalize__(self, other, method=None, **kwargs):
+        self = super(Collection, self).__finalize__(other, method=method, **kwargs)
+        if method == 'concat':
+            # pandas only propagates attrs from concatenated objects
+            for obj in other.objs:
+                if isinstance(obj, Collection) and obj.model_class is not None:
+                    for name in self._metadata:
+                        object.__setattr__(self, name, getattr(obj, name, None))
+                    break
+        return self
+
+    def records(self, view=False):
         """
         Returns an iterator to loop over the rows, each being an instance of the model's record class, i.e. :doc:`jardin_record` by default.
+        :param view: When ``True``, rows are read-only ``RecordView`` instances reading from the collection's columns, which are not copied.
+        :type view: boolean.
         """
-        return ModelIterator(self)
+        return ModelIterator(self, view=view)
 
     def index_by(self, field):
         """
-        Returns a dict with a key for each value of `field` and the first record with that value as value.
+        Returns a dict with a key for each value of `field` and the first record with that value as value. Rows where `field` is null are left out.
         :param field: Name of the field to index by.
         :type field: string.
         """
-        values = self[field].unique()
-        results = {}
-        for value in values:
-            results[value] = self.model_class(**self[self[field] == value].iloc[0])
-        return results
+        unique = self[self[field].notnull()].drop_duplicates(subset=field, keep='first')
+        return dict(zip(unique[field].tolist(), unique._build_records()))
 
+    def group_by(self, field, collections=False):
+        """
+        Returns a dict with a key for each value of `field` and the records with that value, in order, as value. Rows where `field` is null are left out.
+        :param field: Name of the field to group by.
+        :type field: string.
+        :param collections: When ``True``, values are sub-collections instead of lists of records.
+        :type collections: boolean.
+        """
+        groups = self.groupby(field, sort=False).indices
+        if collections:
+            return {key: self.take(positions) for key, positions in groups.items()}
+        records = list(self._build_records())
+        return {key: [records[i] for i in positions] for key, positions in groups.items()}
 
-import pandas.core.reshape.concat
-base_concat = pandas.core.reshape.concat.concat
+    def _build_records(self):
+        columns = self.columns
+        for values in self.itertuples(index=False, name=None):
+            record = self.model_class.from_values(columns, values)
+            if self._included is not None:
+                record._included = self._included
+            yield record
 
-def concat(*args, **kwargs):
-    result = base_concat(*args, **kwargs)
-    if len(args) > 0:
-        for arg in args[0]:
-            if isinstance(arg, Collection) and hasattr(arg, 'model_class'):
-                result.model_class = arg.model_class
-                break
-    return result
 
-pandas.core.reshape.concat.concat = concat
-pandas.concat = concat
+class RecordNotPersisted(Exception): pass
 
 
-class RecordNotPersisted(Exception): pass
+# Locks single-flighting the schema loads of each table, by (db name, table name)
+_table_schema_locks = {}
+_table_schema_locks_lock = threading.Lock()
+
+
+def table_schema_lock(db_name, table_name):
+    with _table_schema_locks_lock:
+        return _table_schema_locks.setdefault((db_name, table_name), threading.RLock())
+
+
+MYSQL_ZERO_DATE = '0000-00-00 00:00:00'
+
+
+class ColumnAttribute(object):
+    """
+    Descriptor reading a column of the table from a record's attributes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            raise AttributeError(self.name)
+        try:
+            return instance.attributes[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+
+class HasMany(object):
+    """
+    Descriptor returning, for a record, a method that selects its children in the ``model_class`` table.
+    """
+
+    def __init__(self, model_class, table_name):
+        self.model_class = model_class
+        self.table_name = table_name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return functools.partial(self.select, instance)
+
+    def select(self, record, **kwargs):
+        key = getattr(record, record.primary_key)
+        included = record._included_relation(self.model_class._table_name())
+        if included is not None and not kwargs:
+            children, groups = included
+            return children.take(groups.get(key, [])).reset_index(drop=True)
+        where = dict(kwargs.get('where', {}))
+        where[self.model_class.belongs_to[self.table_name]] = key
+        kwargs['where'] = where
+        return self.model_class.select(**kwargs)
+
+
+class BelongsTo(object):
+    """
+    Descriptor returning, for a record, a method that finds its parent in the ``table_name`` table.
+    The parent is read with ``model_class``, the model declaring the record's model in its ``has_many``.
+    """
+
+    def __init__(self, table_name, foreign_key, model_class=None):
+        self.table_name = table_name
+        self.foreign_key = foreign_key
+        self.model_class = model_class
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return functools.partial(self.find, instance)
+
+    def find(self, record, **kwargs):
+        key = getattr(record, self.foreign_key)
+        included = record._included_relation(self.table_name)
+        if included is not None and not kwargs:
+            parents, groups = included
+            positions = groups.get(key)
+            if positions is None:
+                return None
+            return parents.model_class.from_values(parents.columns, parents.iloc[positions[0]])
+        if pandas.isnull(key):
+            return None
+        if self.model_class is None:
+            raise ValueError(
+                "No model declares %s in its has_many to read %s from" % (type(record).__name__, self.table_name)
+                )
+        return self.model_class.find(key, **kwargs)
 
 
 class Model(object):
@@ -65,6 +182,9 @@ class Model(object):
       Base class from which your models should inherit.
     """
 
+    # Subclasses declaring empty __slots__ too have records without an instance dict.
+    __slots__ = ('attributes', '_included', '__weakref__')
+
     # These class variables are shared by all threads. They are intended to be set
     # during subclass creation. After initialization they should not be changed.
     table_name = None
@@ -76,36 +196,83 @@ class Model(object):
     collection_class = Collection
     primary_key = 'id'
     soft_delete = False
+    # Serve find() from the session's identity map. Defaults to IDENTITY_MAP in jardin_conf.py.
+    identity_map = None
 
     def __init__(self, **kwargs):
-        self.attributes = dict()
-        table_schema = self.__class__.table_schema()
-        self.attributes[self.primary_key] = kwargs.get(self.primary_key, None)
-        for column in set(list(table_schema.keys()) + list(kwargs.keys())):
-            self.attributes[column] = kwargs.get(
-                column,
-                table_schema.get(column, {}).get('default'))
+        self._set_attributes(kwargs)
+        super(Model, self).__init__()
+
+    @classmethod
+    def from_values(self, columns, values):
+        """
+        Builds a record from column names and the matching values, e.g. a row of a collection.
+
+        :param columns: Column names.
+        :type columns: list
+        :param values: Values, in the same order as ``columns``.
+        :type values: list
+        """
+        if self.__init__ is not Model.__init__:
+            return self(**dict(zip(columns, values)))
+        record = self.__new__(self)
+        record._set_attributes(zip(columns, values))
+        return record
+
+    def _set_attributes(self, values):
+        defaults, zero_dates = self.record_layout()
+        attributes = defaults.copy()
+        attributes.update(values)
+        if zero_dates:
             # MySQL filth
-            if self.attributes[column] == '0000-00-00 00:00:00':
-                self.attributes[column] = None
-            if column in kwargs:
-                del kwargs[column]
-        self.init_relationships()
-        super(Model, self).__init__(**kwargs)
-
-    def __getattribute__(self, i):
+            for column, value in attributes.items():
+                if isinstance(value, str) and value == MYSQL_ZERO_DATE:
+                    attributes[column] = None
+        object.__setattr__(self, 'attributes', attributes)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.init_relationships()
+
+    @classmethod
+    def record_layout(self):
+        """
+        Returns the default attributes of a record and whether MySQL zero dates have to
+        be replaced. Computed once per class from the table schema, which also defines
+        an attribute descriptor for each column.
+        """
+        layout = self.__dict__.get('_record_layout')
+        if layout is None:
+            self.init_relationships()
+            table_schema = self.table_schema() or {}
+            defaults = {self.primary_key: None}
+            for column, info in table_schema.items():
+                defaults[column] = info.get('default')
+            zero_dates = self.db().config.scheme == 'mysql'
+            for column in defaults:
+                # Columns win over the methods of belongs_to named after them
+                if isinstance(column, str) and (not hasattr(self, column) or isinstance(getattr(self, column), BelongsTo)):
+                    setattr(self, column, ColumnAttribute(column))
+            layout = (defaults, zero_dates)
+            if len(table_schema):
+                self._record_layout = layout
+        return layout
+
+    def __getattr__(self, i):
+        if i == 'attributes':
+            return dict()
+        if i == '_included':
+            return None
         try:
-            return super(Model, self).__getattribute__(i)
-        except AttributeError as e:
-            if i == 'attributes':
-                return dict()
-            if i in self.attributes:
-                return self.attributes[i]
-            raise e
+            return self.attributes[i]
+        except KeyError:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'" % (self.__class__.__name__, i)
+                ) from None
 
     def __setattr__(self, i , v):
-        if i == 'attributes':
-            super(Model, self).__setattr__(i, v)
+        if i in Model.__slots__:
+            object.__setattr__(self, i, v)
         else:
             self.attributes[i] = v
             return v
@@ -134,6 +301,9 @@ class Model(object):
     def __delitem__(self, key):
         del self.attributes[key]
 
+    def __contains__(self, key):
+        return key in self.attributes
+
 
     # Individual DB methods
 
@@ -148,14 +318,23 @@ class Model(object):
         if isinstance(self.soft_delete, str):
             return self.soft_delete
 
-    def save(self):
+    def save(self, returning=True):
+        """
+        Inserts or updates the record in the master database.
+
+        :param returning: when ``False``, the written row is not read back and the record's attributes are left untouched.
+        :type returning: boolean
+        """
         if self.persisted:
             return self.__class__.update(
                 values=self,
-                where=self.where_self
+                where=self.where_self,
+                returning=returning
                 )
         else:
-            self.attributes = self.__class__.insert(values=self).attributes
+            record = self.__class__.insert(values=self, returning=returning)
+            if record is not None:
+                self.attributes = record.attributes
 
     def destroy(self, force=False):
         """
@@ -181,6 +360,8 @@ class Model(object):
             raise RecordNotPersisted("Record's primary key is None")
 
     def reload(self):
+        # The row may have been changed by another process, or by a query
+        IdentityMap.forget(type(self), self.attributes[self.primary_key])
         self.__init__(
             **self.__class__.find(
                 self.attributes[self.primary_key]
@@ -191,18 +372,75 @@ class Model(object):
     def persisted(self):
         return self.attributes.get(self.primary_key) is not None
 
+    @classmethod
     def init_relationships(self):
-        this_table_name = self._table_name()
-        for h in self.has_many:
-            other_table_name = h._table_name()
-            def func(slf, **kwargs):
-                where = kwargs.get('where', {})
-                where.update(**{
-                    h.belongs_to[this_table_name]: getattr(slf, slf.primary_key)
-                    })
-                kwargs['where'] = where
-                return h.select(**kwargs)
-            setattr(self.__class__, other_table_name, func)
+        """
+        Defines a method on the class for each model in ``has_many``, named after its table, e.g. ``user.projects()``,
+        and for each table in ``belongs_to``, named after the singular of the table, e.g. ``project.user()``, unless
+        the table has a column with that name.
+        Called when the class is created, and again before the first record is built in case they were assigned later.
+        """
+        relationships = (tuple(self.has_many), tuple(self.belongs_to.items()))
+        if self.__dict__.get('_relationships') == relationships:
+            return
+        # Set first, as models can have many of each other
+        self._relationships = relationships
+        has_many, belongs_to = relationships
+        for table_name, foreign_key in belongs_to:
+            name = self._relationship_name(table_name)
+            # Columns, which raise AttributeError on the class, are not replaced
+            inherited = inspect.getattr_static(self, name, None)
+            if inherited is None or isinstance(inherited, BelongsTo):
+                model_class = inherited.model_class if isinstance(inherited, BelongsTo) else None
+                setattr(self, name, BelongsTo(table_name, foreign_key, model_class))
+        for h in has_many:
+            setattr(self, h._table_name(), HasMany(h, self._table_name()))
+            h.init_relationships()
+            parent = getattr(h, h._relationship_name(self._table_name()), None)
+            if isinstance(parent, BelongsTo) and parent.model_class is None:
+                parent.model_class = self
+
+    @staticmethod
+    def _relationship_name(table_name):
+        import inflect
+        return inflect.engine().singular_noun(table_name) or table_name
+
+    @classmethod
+    def include(self, collection, includes):
+        """
+        Preloads the relations of the records of ``collection`` with one ``IN`` query per model in ``includes``, and groups them by key.
+
+        :param collection: Collection of records of this model.
+        :type collection: jardin.Collection
+        :param includes: Related models, children declared in ``has_many`` or parents declared in ``belongs_to``.
+        :type includes: array
+        """
+        included = dict(collection._included or {})
+        table_name = self._table_name()
+        for model_class in includes:
+            other_table_name = model_class._table_name()
+            if model_class in self.has_many and table_name in model_class.belongs_to:
+                key = model_class.belongs_to[table_name]
+                ids = collection[self.primary_key]
+            elif other_table_name in self.belongs_to:
+                key = model_class.primary_key
+                ids = collection[self.belongs_to[other_table_name]]
+            else:
+                raise ValueError(
+                    "%s is neither a child nor a parent of %s, see has_many and belongs_to" % (
+                        model_class.__name__, self.__name__)
+                    )
+            ids = ids.dropna().unique().tolist()
+            if len(ids) == 0:
+                continue
+            related = model_class.select(where={key: ids})
+            included[other_table_name] = (related, related.groupby(key).indices)
+        collection._included = included
+        return collection
+
+    def _included_relation(self, table_name):
+        if self._included is not None:
+            return self._included.get(table_name)
 
     @classmethod
     def collection_instance(self, result=None):
@@ -214,8 +452,10 @@ class Model(object):
         return collection
 
     @classmethod
-    def stack_mark(self, stack, db_conn=None):
-        return stack_marker(stack, db_conn=db_conn)
+    def stack_mark(self, stack=None, db_conn=None):
+        if stack is not None:
+            return stack_marker(stack, db_conn=db_conn)
+        return watermark_marker(db_conn=db_conn)
 
     @classmethod
     @soft_del
@@ -245,7 +485,15 @@ class Model(object):
         :type db: string
         :param role: One of ``('master', 'replica')`` to override the default.
         :type role: string
-        :returns: ``jardin.Collection`` instance, which is a ``pandas.DataFrame``.
+        :param output: ``'arrow'`` to return a ``pyarrow.Table`` instead of a collection.
+        :type output: string
+        :param dtype_backend: ``'pyarrow'`` to back the collection's columns with ``pandas.ArrowDtype``, ``'numpy'`` otherwise. Defaults to ``DTYPE_BACKEND`` from ``jardin_conf.py``.
+        :type dtype_backend: string
+        :param includes: Models to preload, each with a single query: children declared in ``has_many``, or parents declared in ``belongs_to``. Records built from the collection then return them without querying the database, e.g. ``user.projects()`` or ``project.user()``.
+        :type includes: array
+        :param compact: Convert low-cardinality text columns to categories and downcast numeric columns where lossless. Defaults to ``COMPACT`` from ``jardin_conf.py``.
+        :type compact: boolean
+        :returns: ``jardin.Collection`` instance, which is a ``pandas.DataFrame``, or a ``pyarrow.Table``.
         """
         db_adapter = self.db_adapter(
             db_name=kwargs.get('db'),
@@ -253,9 +501,43 @@ class Model(object):
             )
 
         client_provider = db_adapter.client_provider
-        kwargs['stack'] = self.stack_mark(inspect.stack(), db_conn=client_provider)
+        kwargs['stack'] = self.stack_mark(db_conn=client_provider)
+
+        includes = kwargs.pop('includes', None)
+        if includes and kwargs.get('output') == 'arrow':
+            raise ValueError("includes cannot be preloaded with output='arrow'")
+        results = db_adapter.select(**kwargs)
+        if kwargs.get('output') == 'arrow':
+            return results
+        collection = self.collection_instance(results)
+        if includes:
+            self.include(collection, includes)
+        return collection
+
+    @classmethod
+    @soft_del
+    def select_iter(self, chunksize=10000, **kwargs):
+        """
+        Performs a SELECT statement like ``select`` and reads its results in chunks from a server-side cursor (a named cursor on PostgreSQL, an unbuffered cursor on MySQL). Memory is bounded by ``chunksize``.
+
+        The connection stays checked out until the generator is exhausted or closed.
+
+        :param chunksize: Maximum number of rows per chunk.
+        :type chunksize: integer
+        :returns: a generator of ``jardin.Collection`` instances, or of ``pyarrow.Table`` instances with ``output='arrow'``.
+        """
+        db_adapter = self.db_adapter(
+            db_name=kwargs.get('db'),
+            role=kwargs.get('role', 'replica')
+            )
 
-        return self.collection_instance(db_adapter.select(**kwargs))
+        kwargs['stack'] = self.stack_mark(db_conn=db_adapter.client_provider)
+
+        for chunk in db_adapter.select_iter(chunksize=chunksize, **kwargs):
+            if kwargs.get('output') == 'arrow':
+                yield chunk
+            else:
+                yield self.collection_instance(chunk)
 
     @classmethod
     def query(self, sql=None, filename=None, **kwargs):
@@ -269,7 +551,9 @@ class Model(object):
         :type db: string
         :param role: `optional` One of ``('master', 'replica')`` to override the default.
         :type role: string
-        :returns: ``jardin.Collection`` collection, which is a ``pandas.DataFrame``.
+        :param chunksize: `optional` Read results in chunks of at most ``chunksize`` rows.
+        :type chunksize: integer
+        :returns: ``jardin.Collection`` collection, which is a ``pandas.DataFrame``, or a generator of collections with ``chunksize``.
         """
         results = query(
             sql=sql,
@@ -280,6 +564,8 @@ class Model(object):
 
         if results is None:
             return None
+        elif kwargs.get('chunksize'):
+            return (self.collection_instance(chunk) for chunk in results)
         else:
             return self.collection_instance(results)
 
@@ -317,6 +603,9 @@ class Model(object):
 
         :param values: A dictionary containing the values to be inserted. ``datetime``, ``dict`` and ``bool`` objects can be passed as is and will be correctly serialized by psycopg2.
         :type values: dict
+        :param returning: when ``False``, inserted rows are not returned, which saves reading them back.
+        :type returning: boolean
+        :returns: an instance of the model, a ``jardin.Collection`` when several rows were inserted, or ``None``.
         """
         if len(kwargs['values']) == 0:
             config.logger.warning('No values to insert.')
@@ -329,7 +618,7 @@ class Model(object):
                 if v is None:
                     del kwargs['values'][k]
 
-        kwargs['stack'] = self.stack_mark(inspect.stack())
+        kwargs['stack'] = self.stack_mark()
         kwargs['primary_key'] = self.primary_key
 
         column_names = self.table_schema().keys()
@@ -339,9 +628,71 @@ class Model(object):
                 kwargs['values'][field] = kwargs['values'].get(field, now)
             else:
                 kwargs['values'][field] = now
+        self.invalidate_identity_map()
         results = self.db_adapter(role='master').insert(**kwargs)
         return self.record_or_model(results)
 
+    @classmethod
+    def upsert(self, values, conflict, update=None, chunksize=1000, returning=True):
+        """
+        Inserts rows in the model's table in the master database, updating the existing rows they conflict with (``INSERT ... ON CONFLICT`` or ``ON DUPLICATE KEY UPDATE``).
+
+        :param values: Rows to upsert.
+        :type values: dict, ``pandas.DataFrame``, or a list of dicts
+        :param conflict: Columns of the unique constraint to resolve conflicts on. MySQL resolves them on any unique key.
+        :type conflict: list
+        :param update: Columns to update on conflict. Defaults to all inserted columns except ``conflict``, the primary key and ``created_at``. An empty list leaves conflicting rows untouched.
+        :type update: list
+        :param chunksize: Maximum number of rows per statement.
+        :type chunksize: integer
+        :param returning: when ``False``, upserted rows are not returned.
+        :type returning: boolean
+        :returns: an instance of the model, a ``jardin.Collection`` when several rows were upserted, or ``None``.
+        """
+        if isinstance(values, self):
+            values = values.attributes
+        if isinstance(values, dict):
+            values = {k: v for (k, v) in values.items() if v is not None}
+        column_names = self.table_schema().keys()
+        now = datetime.utcnow()
+        self.invalidate_identity_map()
+        results = self.db_adapter(role='master').upsert(
+            values=values,
+            conflict=conflict,
+            update=update,
+            chunksize=chunksize,
+            returning=returning,
+            defaults={f: now for f in ('created_at', 'updated_at') if f in column_names},
+            primary_key=self.primary_key,
+            stack=self.stack_mark()
+            )
+        return self.record_or_model(results)
+
+    @classmethod
+    def bulk_insert(self, values, chunksize=1000, method=None):
+        """
+        Inserts a large number of rows in the model's table in the master database, ``chunksize`` rows per statement. Rows are streamed chunk by chunk and are not returned.
+
+        :param values: Rows to insert.
+        :type values: ``pandas.DataFrame``, or an iterable of dicts
+        :param chunksize: Maximum number of rows per statement.
+        :type chunksize: integer
+        :param method: One of ``('values', 'executemany', 'copy')``. Defaults to ``copy`` (``COPY FROM STDIN``) on postgres, ``executemany`` on mysql and sqlite and multi-row ``VALUES`` otherwise.
+        :type method: string
+        :returns: the number of inserted rows.
+        """
+        column_names = self.table_schema().keys()
+        now = datetime.utcnow()
+        self.invalidate_identity_map()
+        return self.db_adapter(role='master').bulk_insert(
+            values=values,
+            chunksize=chunksize,
+            method=method,
+            defaults={f: now for f in ('created_at', 'updated_at') if f in column_names},
+            primary_key=self.primary_key,
+            stack=self.stack_mark()
+            )
+
     @classmethod
     def record_or_model(self, results):
         if results is None:
@@ -361,20 +712,60 @@ class Model(object):
         :type values: dict
         :param where: The WHERE clause. This can be a plain string, a dict or an array.
         :type where: string, dict, array
+        :param returning: when ``False``, updated rows are not returned, which saves reading them back.
+        :type returning: boolean
+        :returns: an instance of the model, a ``jardin.Collection`` when several rows were updated, or ``None``.
         """
-        kwargs['stack'] = self.stack_mark(inspect.stack())
+        kwargs['stack'] = self.stack_mark()
         kwargs['primary_key'] = self.primary_key
         column_names = self.table_schema().keys()
         now = datetime.utcnow()
         if 'updated_at' in column_names:
             if 'updated_at' not in kwargs['values']:
                 kwargs['values']['updated_at'] = now
+        self.invalidate_identity_map()
         results = self.db_adapter(role='master').update(**kwargs)
         return self.record_or_model(results)
 
+    @classmethod
+    def bulk_update(self, values, key=None, columns=None, chunksize=1000, method=None):
+        """
+        Updates many rows of the model's table in the master database, each with its own values, matching them on ``key``.
+
+        :param values: Rows to update, including the ``key`` column.
+        :type values: ``pandas.DataFrame``, or a list of dicts
+        :param key: Column identifying the rows to update. Defaults to the primary key.
+        :type key: string
+        :param columns: Columns to update. Defaults to all the columns of ``values`` except ``key``.
+        :type columns: list
+        :param chunksize: Maximum number of rows per statement.
+        :type chunksize: integer
+        :param method: One of ``('values', 'case', 'executemany')``. Defaults to ``UPDATE ... FROM (VALUES ...)`` on postgres, ``executemany`` on sqlite and ``CASE`` expressions otherwise.
+        :type method: string
+        :returns: the number of rows sent to the database.
+        """
+        key = key or self.primary_key
+        if not isinstance(values, pandas.DataFrame):
+            values = pandas.DataFrame(list(values))
+        if columns is None:
+            columns = [c for c in values.columns if c != key]
+        defaults = {}
+        if 'updated_at' in self.table_schema().keys() and 'updated_at' not in columns:
+            defaults['updated_at'] = datetime.utcnow()
+        self.invalidate_identity_map()
+        return self.db_adapter(role='master').bulk_update(
+            values=values[[key] + list(columns)],
+            key=key,
+            chunksize=chunksize,
+            method=method,
+            defaults=defaults,
+            primary_key=self.primary_key,
+            stack=self.stack_mark()
+            )
+
     @classorinstancemethod
     def touch(self, **kwargs):
-        if type(self) == type:
+        if isinstance(self, type):
             kwargs['values'] = {'updated_at': datetime.utcnow()}
             return self.update(**kwargs)
         else:
@@ -391,8 +782,8 @@ class Model(object):
         :param where: The WHERE clause. This can be a plain string, a dict or an array.
         :type where: string, dict, array
         """
-        kwargs['stack'] = self.stack_mark(inspect.stack())
-
+        kwargs['stack'] = self.stack_mark()
+        self.invalidate_identity_map()
         return self.db_adapter(role='master').delete(**kwargs)
 
     @classmethod
@@ -420,25 +811,160 @@ class Model(object):
         :type values: dict
         :returns: an instance of the model.
         """
+        use_identity_map = not kwargs and self.uses_identity_map() and \
+            isinstance(values, dict) and list(values.keys()) == [self.primary_key]
+        if use_identity_map:
+            record = IdentityMap.get(self, values[self.primary_key])
+            if record is not None:
+                return record
+        collection = self.select(where=values, limit=1, **kwargs)
         try:
-            return self(
-                **self.select(
-                    where=values,
-                    limit=1,
-                    **kwargs
-                    ).to_dict(orient='records')[0]
-                )
+            record = self(**collection.to_dict(orient='records')[0])
         except IndexError:
             return None
+        if collection._included is not None:
+            record._included = collection._included
+        if use_identity_map:
+            IdentityMap.set(self, values[self.primary_key], record)
+        return record
 
     @classmethod
     def find(self, id, **kwargs):
         """
         Finds a record by its id in the model's table in the replica database.
+
+        When the model uses the identity map, records already found during the session are returned without querying the database.
         :returns: an instance of the model.
         """
         return self.find_by(values={self.primary_key: id}, **kwargs)
 
+    @classmethod
+    def find_many(self, ids, chunksize=500, workers=None, **kwargs):
+        """
+        Finds the records whose primary key is in ``ids`` in the model's table in the replica database, with one ``IN`` query per chunk of ``chunksize`` distinct ids. Accepts the other arguments of ``select``.
+
+        :param ids: Primary key values, e.g. integers or strings of integers. Duplicates are looked up once.
+        :type ids: iterable
+        :param chunksize: Maximum number of ids per query.
+        :type chunksize: integer
+        :param workers: `optional` Number of threads running the queries concurrently, each with its own connection, closed when its queries are done. Queries run one after the other by default.
+        :type workers: integer
+        :returns: ``jardin.Collection`` instance with the rows of the ids found, ordered like ``ids``.
+        """
+        ids = pandas.Series(list(ids), dtype=object).dropna().infer_objects().drop_duplicates().tolist()
+        if len(ids) == 0:
+            return self.collection_instance()
+        includes = kwargs.pop('includes', None)
+        where = kwargs.pop('where', None)
+        if where is None:
+            where = []
+        elif not isinstance(where, list):
+            where = [where]
+        chunks = [ids[start:start + chunksize] for start in range(0, len(ids), chunksize)]
+        # Qualified in case other tables are joined
+        key = '%s.%s' % (self._table_alias(), self.primary_key)
+
+        def select(chunk):
+            return self.select(where=where + [{key: chunk}], **kwargs)
+
+        def select_in_worker(worker_chunks):
+            # Clients are thread-local: the worker's connections would stay open until garbage collected
+            try:
+                return [select(chunk) for chunk in worker_chunks]
+            finally:
+                Datasources.disconnect_clients()
+
+        if workers and len(chunks) > 1:
+            workers = min(workers, len(chunks))
+            with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                groups = pool.map(select_in_worker, [chunks[i::workers] for i in range(workers)])
+                results = [result for group in groups for result in group]
+        else:
+            results = [select(chunk) for chunk in chunks]
+        # Chunks with no rows found would turn the columns of the others to object dtype
+        results = [result for result in results if len(result) > 0] or results[:1]
+        collection = results[0] if len(results) == 1 else pandas.concat(results, ignore_index=True)
+        keys = pandas.Index(collection[self.primary_key])
+        try:
+            # e.g. ids read from URLs as strings, matched by the database against integers
+            ids = pandas.Index(ids, dtype=object).astype(keys.dtype)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "Ids of %s cannot be converted to the %s type of %s" % (self.__name__, keys.dtype, self.primary_key)
+                ) from None
+        # Rows are not unique per id when joins are selected
+        positions = keys.get_indexer_non_unique(ids.drop_duplicates())[0]
+        collection = collection.take(positions[positions >= 0]).reset_index(drop=True)
+        if includes:
+            self.include(collection, includes)
+        return collection
+
+    @classmethod
+    def uses_identity_map(self):
+        if self.identity_map is None:
+            return config.IDENTITY_MAP
+        return self.identity_map
+
+    @classmethod
+    def invalidate_identity_map(self):
+        """
+        Forgets the records of the model's table found during the session.
+        """
+        IdentityMap.invalidate(self)
+
+    @classmethod
+    def find_in_batches(self, batch_size=1000, where=None, order_key=None, **kwargs):
+        """
+        Iterates over the rows matching ``where`` in batches, paging with ``WHERE order_key > last_value ORDER BY order_key LIMIT batch_size`` so that every page is an index range scan. Accepts the other arguments of ``select``, including ``scopes``, and respects ``soft_delete``.
+
+        :param batch_size: Number of rows per batch.
+        :type batch_size: integer
+        :param where: WHERE clause, see ``select``.
+        :type where: string, dict, array
+        :param order_key: Unique column to page over. Defaults to the primary key. It must be part of the selected columns.
+        :type order_key: string
+        :returns: a generator of ``jardin.Collection`` instances.
+        """
+        order_key = order_key or self.primary_key
+        if '.' in order_key:
+            column, order_key = order_key, order_key.split('.')[-1]
+        else:
+            column = '%s.%s' % (self._table_alias(), order_key)
+        last = None
+        while True:
+            batch_where = where
+            if last is not None:
+                condition = ['%s > %%(last_key)s' % column, {'last_key': last}]
+                if where is None:
+                    batch_where = [condition]
+                elif isinstance(where, list):
+                    batch_where = where + [condition]
+                else:
+                    batch_where = [where, condition]
+            batch = self.select(
+                where=batch_where,
+                order='%s ASC' % column,
+                limit=batch_size,
+                **kwargs
+                )
+            if len(batch) == 0:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            last = batch[order_key].iloc[-1:].tolist()[0]
+
+    @classmethod
+    def find_each(self, batch_size=1000, **kwargs):
+        """
+        Iterates over the records matching the arguments of ``find_in_batches``, one record at a time.
+
+        :returns: a generator of model instances.
+        """
+        for batch in self.find_in_batches(batch_size=batch_size, **kwargs):
+            for record in batch.records():
+                yield record
+
     @classmethod
     def db_adapter(self, role='replica', db_name=None):
         if not hasattr(self, '_db_metadata'):
@@ -470,13 +996,13 @@ class Model(object):
 
     @classmethod
     def _table_name(self):
-        if self.__dict__.get('__table_name') is None:
+        if self.__dict__.get('_Model__table_name') is None:
             self.__table_name = self.table_name or self._default_table_name()
         return self.__table_name
 
     @classmethod
     def _table_alias(self):
-        if self.__dict__.get('__table_alias') is None:
+        if self.__dict__.get('_Model__table_alias') is None:
             self.__table_alias = self.table_alias or self._default_table_alias(
                 self._table_name()
                 )
@@ -500,10 +1026,10 @@ class Model(object):
     @classmethod
     def _use_replica(self, **kwargs):
         try:
-            kwargs['stack'] = self.stack_mark(inspect.stack())
+            kwargs['stack'] = self.stack_mark()
             sql = "select setting FROM pg_settings WHERE name = 'hot_standby'"
             r = self.collection_instance(
-                self.db_adapter().raw_query(sql=sql, **kwargs)
+                self.db_adapter().raw_query(sql=sql, dtype_backend='numpy', **kwargs)
                 ).squeeze()
             return r == "on"
         except:
@@ -519,11 +1045,11 @@ class Model(object):
         if not self._use_replica():
             return 0
         try:
-            kwargs['stack'] = self.stack_mark(inspect.stack())
+            kwargs['stack'] = self.stack_mark()
             sql = "select EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()) AS replication_lag"
             return self.collection_instance(
                 self.db_adapter().raw_query(
-                    sql=sql, **kwargs
+                    sql=sql, dtype_backend='numpy', **kwargs
                     )
                 ).squeeze()
         except:
@@ -537,21 +1063,33 @@ class Model(object):
         :returns: dict
         """
         if self.__dict__.get('_table_schema') is None:
-            self._table_schema = None
-            table_schema = {}
+            # Threads wait for the schema of the table being loaded instead of querying it again
+            with table_schema_lock(self.db_names.get('replica'), self._table_name()):
+                if self.__dict__.get('_table_schema') is None:
+                    table_schema = {}
+                    for name, default, dtype in self.schema_columns():
+                        if isinstance(default, str):
+                            json_matches = re.findall(r"^\'(.*)\'::jsonb$", default)
+                            if len(json_matches) > 0:
+                                default = json.loads(json_matches[0])
+                        if name == self.primary_key:
+                            default = None
+                        table_schema[name] = {'default': default, 'type': dtype}
+                    if len(table_schema):
+                        self._table_schema = table_schema
+        return self.__dict__.get('_table_schema')
+
+    @classmethod
+    def schema_columns(self):
+        """
+        Returns the columns of the table as ``(name, default, type)`` tuples, from the
+        schemas preloaded with ``jardin.preload_schemas`` when they include the table.
+        """
+        columns = SchemaCache.get(self.db_names.get('replica')).columns(self._table_name())
+        if columns is None:
             lexicon = self.db().lexicon
-            for row in self.query_schema():
-                name, default, dtype = lexicon.column_info(row)
-                if isinstance(default, str):
-                    json_matches = re.findall(r"^\'(.*)\'::jsonb$", default)
-                    if len(json_matches) > 0:
-                        default = json.loads(json_matches[0])
-                if name == self.primary_key:
-                    default = None
-                table_schema[name] = {'default': default, 'type': dtype}
-            if len(table_schema):
-                self._table_schema = table_schema
-        return self._table_schema
+            columns = [lexicon.column_info(row) for row in self.query_schema()]
+        return columns
 
     @classmethod
     def query_schema(self):
@@ -562,31 +1100,93 @@ class Model(object):
             )
         return db_adapter.raw_query(
             sql=client_provider.lexicon.table_schema_query(self._table_name()),
-            where={'table_name': self._table_name()}
+            where={'table_name': self._table_name()},
+            dtype_backend='numpy'
             ).to_dict(orient='records')
 
     @classmethod
     def clear_caches(self):
+        SchemaCache.get(self.db_names.get('replica')).forget(self._table_name())
         self._table_schema = None
+        self._record_layout = None
         self._db_metadata = {}
         self.__table_alias = None
         self.__table_name = None
 
 class ModelIterator(object):
 
-    def __init__(self, collection):
+    def __init__(self, collection, view=False):
         self.collection = collection
         self.current = 0
+        if view:
+            self._records = RecordView.iterate(collection)
+        else:
+            self._records = collection._build_records()
 
     def __iter__(self):
         return self
 
     def next(self):
-        if self.current < len(self.collection):
-            record = self.collection.model_class(
-                **self.collection.iloc[self.current]
-                )
-            self.current += 1
-            return record
+        record = next(self._records)
+        self.current += 1
+        return record
+
+    __next__ = next
+
+
+class RecordView(object):
+    """
+    Read-only record reading its values from a row of a collection's column arrays, without copying them.
+    Values are returned as stored in the columns, e.g. as numpy scalars.
+    """
+
+    __slots__ = ('_columns', '_collection', '_position')
+
+    def __init__(self, columns, collection, position):
+        self._columns = columns
+        self._collection = collection
+        self._position = position
+
+    @classmethod
+    def iterate(cls, collection):
+        columns = {}
+        for i, name in enumerate(collection.columns):
+            column = collection.iloc[:, i]
+            if pandas.api.types.is_extension_array_dtype(column.dtype):
+                columns[name] = column.array
+            else:
+                columns[name] = column.to_numpy()
+        for position in range(len(collection)):
+            yield cls(columns, collection, position)
+
+    def __getattr__(self, i):
+        try:
+            return self._columns[i][self._position]
+        except KeyError:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'" % (self.__class__.__name__, i)
+                ) from None
+
+    def __getitem__(self, key):
+        return self._columns[key][self._position]
+
+    def __setattr__(self, i, v):
+        if i in RecordView.__slots__:
+            object.__setattr__(self, i, v)
         else:
-            raise StopIteration()
+            raise AttributeError("%s is read-only, see to_record" % self.__class__.__name__)
+
+    @property
+    def attributes(self):
+        return {name: values[self._position] for (name, values) in self._columns.items()}
+
+    def to_record(self):
+        """
+        Returns an instance of the collection's model with the values of the row.
+        """
+        return next(self._collection.iloc[self._position:self._position + 1]._build_records())
+
+    def __repr__(self):
+        return 'RecordView(%s)' % ', '.join(
+            '%s=%r' % (name, value) for (name, value) in self.attributes.items()
+            )
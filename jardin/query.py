@@ -1,15 +1,19 @@
 import argparse
 import os
-import inspect
 from jardin.database.client_provider import ClientProvider
 from jardin.database.database_adapter import DatabaseAdapter
-from jardin.tools import stack_marker
+from jardin.tools import watermark_marker
 
-def query(sql=None, filename=None, extract=None, db=None, **kwargs):
+def query(sql=None, filename=None, extract=None, db=None, chunksize=None, **kwargs):
+    """
+    Runs a raw SQL query, from ``sql`` or from the file at ``filename``, against the database ``db``.
+    With ``chunksize``, returns a generator of DataFrames of at most ``chunksize`` rows read from a server-side cursor.
+    With ``compact=True``, low-cardinality text columns become categories and numeric columns are downcast where lossless.
+    """
     if db is None:
         raise argparse.ArgumentError('You must provide a database name')
 
-    kwargs['stack'] = stack_marker(inspect.stack())
+    kwargs['stack'] = watermark_marker()
 
     filename = filename or extract
 
@@ -19,9 +23,13 @@ def query(sql=None, filename=None, extract=None, db=None, **kwargs):
     if 'where' not in kwargs and 'params' in kwargs:
         kwargs['where'] = kwargs['params']
 
-    return DatabaseAdapter(
-        ClientProvider(db),
-        None
-        ).raw_query(
+    db_adapter = DatabaseAdapter(ClientProvider(db), None)
+
+    if chunksize:
+        return db_adapter.raw_query_iter(
+            sql=sql, filename=filename, chunksize=chunksize, **kwargs
+            )
+
+    return db_adapter.raw_query(
             sql=sql, filename=filename, **kwargs
         )
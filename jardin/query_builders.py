@@ -1,10 +1,67 @@
-import re, collections, json, sys
+import re, collections, json, numbers, sys, sqlite3, threading
 from memoized_property import memoized_property
 import pandas as pd
 import numpy as np
 
 import jardin.model
 import jardin.config as config
+from jardin.database.sql_templates import SqlTemplates
+
+
+class QueryTemplateCache(object):
+    """
+    Least recently used SQL templates of select queries, indexed by the shape of
+    their arguments, i.e. everything but the values bound to the query. Its size
+    is set by ``QUERY_TEMPLATE_CACHE_SIZE`` in ``jardin_conf.py``, 0 disables it.
+    """
+
+    def __init__(self):
+        self.templates = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, shape):
+        with self.lock:
+            template = self.templates.get(shape)
+            if template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.templates.move_to_end(shape)
+            return template
+
+    def set(self, shape, template):
+        maxsize = config.QUERY_TEMPLATE_CACHE_SIZE
+        with self.lock:
+            self.templates[shape] = template
+            while len(self.templates) > maxsize:
+                self.templates.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the number of hits and misses since the cache was last cleared and its size.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.templates)}
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+query_templates = QueryTemplateCache()
+
+
+class UncacheableQuery(Exception): pass
+
+
+# Column types compared to text[] arrays on postgres
+PG_TEXT_TYPES = ('text', 'character varying', 'character')
+# Schemas do not include lengths, which these types would default to 1.
+PG_UNBOUNDED_TYPES = {'character': 'character varying', 'bit': 'bit varying'}
 
 
 class PGQueryBuilder(object):
@@ -52,11 +109,22 @@ class PGQueryBuilder(object):
     def stack(self):
         return self.kwargs.get('stack', '')
 
+    @memoized_property
+    def watermark_tag(self):
+        if not self.stack and not config.WATERMARK:
+            return ''
+        return "%s | %s" % (config.WATERMARK, self.stack)
+
     @memoized_property
     def watermark(self):
-        return "/*%s | %s */" % (config.WATERMARK, self.stack)
+        if not self.watermark_tag:
+            return ''
+        return "/*%s */" % self.watermark_tag
 
     def apply_watermark(self, query):
+        # Other transports carry the watermark out of the query, see DatabaseAdapter.watermark
+        if not self.watermark or config.WATERMARK_TRANSPORT != 'comment':
+            return query
         return self.lexicon.apply_watermark(query, self.watermark)
 
     @staticmethod
@@ -99,10 +167,14 @@ class SelectQueryBuilder(PGQueryBuilder):
         return results
 
     @memoized_property
-    def wheres(self):
+    def all_wheres(self):
         wheres = self.kwargs.get('where', None)
         if not isinstance(wheres, list): wheres = [wheres]
-        wheres += self.scope_wheres
+        return wheres + self.scope_wheres
+
+    @memoized_property
+    def wheres(self):
+        wheres = self.all_wheres
         res = [self.where_items(where) for where in wheres]
         results = ['(%s)' % ' '.join(item) for sublist in res for item in sublist]
         return ' AND '.join(results)
@@ -154,13 +226,17 @@ class SelectQueryBuilder(PGQueryBuilder):
                         results += [[k, op, self.add_to_where_values(k, val)]]
                     else:
                         results += [[k, op]]
-                else:
-                    if isinstance(v, list) or isinstance(v, pd.Series) or \
-                        (isinstance(v, tuple) and len(v) != 2):
-                        operator = 'IN'
+                elif isinstance(v, list) or isinstance(v, pd.Series) or \
+                    (isinstance(v, tuple) and len(v) != 2):
+                    binding = self.in_list_binding(k, v)
+                    if binding is None:
+                        results += [[k, 'IN', self.add_to_where_values(k, v)]]
                     else:
-                        operator = '='
-                    results += [[k, operator, self.add_to_where_values(k, v)]]
+                        key = self.where_key(k)
+                        self.where_values[key] = binding[1]
+                        results += [[k, binding[0] % self.extrapolator(key)]]
+                else:
+                    results += [[k, '=', self.add_to_where_values(k, v)]]
         elif isinstance(where, list):
             result = where[0]
             for l in re.findall('%\((\S+)\)s', result):
@@ -171,10 +247,44 @@ class SelectQueryBuilder(PGQueryBuilder):
             results += [[result]]
         return results
 
+    def column_type(self, field):
+        parts = field.split('.')
+        if len(parts) == 2 and parts[0] in (self.table_name, self.table_alias):
+            field = parts[1]
+        table_schema = self.model_metadata.get('table_schema') or {}
+        return table_schema.get(field, {}).get('type')
+
+    def in_list_binding(self, field, values):
+        """
+        Returns the condition on ``field`` matching a list of values as a single parameter, with
+        ``%s`` in place of the parameter, and the value to bind to it, or ``None`` to bind the list
+        as is. On postgres, integers and text are bound as an array. On sqlite, lists of more
+        than ``IN_LIST_THRESHOLD`` values are bound as a JSON array.
+        """
+        values = values.tolist() if isinstance(values, pd.Series) else list(values)
+        if self.scheme == 'postgres':
+            if all(isinstance(v, numbers.Integral) and not isinstance(v, (bool, np.bool_)) for v in values):
+                return ('= ANY(%s::bigint[])', [int(v) for v in values])
+            if all(isinstance(v, str) for v in values) and self.column_type(field) in PG_TEXT_TYPES:
+                return ('= ANY(%s::text[])', values)
+        elif self.scheme == 'sqlite' and len(values) > config.IN_LIST_THRESHOLD:
+            if all(v is None or isinstance(v, (numbers.Number, str)) for v in values):
+                try:
+                    return ('IN (SELECT value FROM json_each(%s))', json.dumps(values, allow_nan=False))
+                except (TypeError, ValueError):
+                    pass
+        return None
+
     @memoized_property
     def limit(self):
         return self.kwargs.get('limit', None)
 
+    @property
+    def bound_limit(self):
+        """Whether the limit is bound as a parameter rather than written in the query."""
+        limit = self.kwargs.get('limit')
+        return isinstance(limit, int) and not isinstance(limit, bool)
+
     @memoized_property
     def having(self):
         return self.kwargs.get('having', None)
@@ -221,8 +331,90 @@ class SelectQueryBuilder(PGQueryBuilder):
             foreign_key = 'id'
         return "%(how)s JOIN %(join_table_name)s %(join_table_alias)s ON %(table_alias)s.%(primary_key)s = %(join_table_alias)s.%(foreign_key)s" % {'how': how, 'join_table_name': join_table_name, 'join_table_alias': join_table_alias, 'table_alias': table_alias, 'foreign_key': foreign_key, 'primary_key': primary_key}
 
+    def value_shape(self, value, values):
+        # Mirrors add_to_where_values
+        if isinstance(value, pd.Series) or isinstance(value, list):
+            value = tuple(value)
+            if self.scheme == 'sqlite':
+                values += value
+                return len(value)
+        values += [value]
+        return None
+
+    def where_shape(self, where, values):
+        # Mirrors where_items, appending the values bound to the query to ``values``
+        if isinstance(where, str):
+            return where
+        elif isinstance(where, tuple):
+            return ('tuple', self.value_shape(where[1], values))
+        elif isinstance(where, dict):
+            shape = []
+            for (k, v) in where.items():
+                if isinstance(v, tuple) and len(v) == 2:
+                    shape += [(k, 'BETWEEN', self.value_shape(v[0], values), self.value_shape(v[1], values))]
+                elif isinstance(v, dict):
+                    for (kk, vv) in v.items():
+                        cast = 'INTEGER' if isinstance(vv, int) else 'FLOAT' if isinstance(vv, float) else None
+                        shape += [(k, kk, cast, self.value_shape(vv, values))]
+                elif not isinstance(v, list) and not isinstance(v, pd.Series) and not isinstance(v, np.ndarray) and pd.isnull(v):
+                    shape += [(k, 'IS NULL')]
+                elif callable(v):
+                    raise UncacheableQuery()
+                else:
+                    in_list = isinstance(v, list) or isinstance(v, pd.Series) or (isinstance(v, tuple) and len(v) != 2)
+                    binding = self.in_list_binding(k, v) if in_list else None
+                    if binding is None:
+                        shape += [(k, in_list, self.value_shape(v, values))]
+                    else:
+                        values += [binding[1]]
+                        shape += [(k, binding[0])]
+            return ('dict', tuple(shape))
+        elif isinstance(where, list):
+            return ('sql', where[0], tuple((k, self.value_shape(v, values)) for (k, v) in where[1].items()))
+        return None
+
+    @memoized_property
+    def shape(self):
+        """
+        Returns the key of the query's template in ``query_templates`` and the values
+        bound to it, or ``None`` when the query cannot be cached.
+        """
+        if not config.QUERY_TEMPLATE_CACHE_SIZE:
+            return None
+        # Read from the arguments rather than the builder's properties, which are slower
+        kwargs = self.kwargs
+        metadata = kwargs['model_metadata']
+        values = []
+        try:
+            joins = (kwargs.get('left_join'), kwargs.get('inner_join'))
+            joins = tuple(tuple(j) if isinstance(j, list) else j for j in joins)
+            belongs_to = None
+            if any(not isinstance(j, (str, type(None))) for j in joins):
+                belongs_to = tuple(sorted(metadata['belongs_to'].items()))
+            selects = kwargs.get('select')
+            if isinstance(selects, list):
+                selects = tuple(selects)
+            elif isinstance(selects, dict):
+                selects = tuple(selects.items())
+            wheres = kwargs.get('where')
+            wheres = wheres if isinstance(wheres, list) else [wheres]
+            if kwargs.get('scopes'):
+                wheres = wheres + self.scope_wheres
+            limit = kwargs.get('limit')
+            shape = (
+                kwargs.get('lexicon'), kwargs.get('scheme'), metadata['table_name'], metadata['table_alias'],
+                selects, joins, belongs_to,
+                tuple([self.where_shape(where, values) for where in wheres]),
+                kwargs.get('group'), kwargs.get('having'), kwargs.get('order'),
+                bool(limit) if self.bound_limit else limit
+                )
+            hash(shape)
+        except (UncacheableQuery, TypeError):
+            return None
+        return (shape, values)
+
     @memoized_property
-    def query(self):
+    def template(self):
         query = ['SELECT', self.selects, 'FROM', self.froms]
         query += self.left_joins
         query += self.inner_joins
@@ -230,10 +422,34 @@ class SelectQueryBuilder(PGQueryBuilder):
         if self.group_bys: query += ['GROUP BY', self.group_bys]
         if self.having: query += ['HAVING', self.having]
         if self.order_bys: query += ['ORDER BY', self.order_bys]
-        if self.limit: query += ['LIMIT', str(self.limit)]
-        query = ' '.join(query) + ';'
-        query = self.apply_watermark(query)
-        return (query, self.lexicon.format_args(self.where_values))
+        if self.limit:
+            if self.bound_limit:
+                self.where_values['limit'] = self.limit
+                query += ['LIMIT', self.extrapolator('limit')]
+            else:
+                query += ['LIMIT', str(self.limit)]
+        return ' '.join(query) + ';'
+
+    @memoized_property
+    def query(self):
+        shape = self.shape
+        template = None
+        if shape is not None:
+            shape, values = shape
+            template = query_templates.get(shape)
+        limit = self.kwargs.get('limit') if self.bound_limit else None
+        if template is None:
+            template = self.template
+            where_values = self.where_values
+            # The template's values must be the values of the shape, in the same order
+            if shape is not None and len(where_values) == len(values) + (1 if limit else 0):
+                query_templates.set(shape, template)
+        else:
+            where_values = collections.OrderedDict([('val_%s' % i, v) for (i, v) in enumerate(values)])
+            if limit:
+                where_values['limit'] = limit
+        query = self.apply_watermark(template)
+        return (query, self.lexicon.format_args(where_values))
 
 
 class WriteQueryBuilder(PGQueryBuilder):
@@ -254,38 +470,58 @@ class WriteQueryBuilder(PGQueryBuilder):
             if col in kw_values:
                 del kw_values[col]
 
+        for (col, default) in self.kwargs.get('defaults', {}).items():
+            if col not in kw_values:
+                kw_values[col] = default
+
         return kw_values
 
     @memoized_property
     def primary_key(self):
         return self.kwargs.get('primary_key', jardin.model.Model.primary_key)
 
+    @memoized_property
+    def returning(self):
+        """Whether the written rows are returned by the write statement itself."""
+        if not self.kwargs.get('returning', True):
+            return False
+        if self.scheme == 'sqlite':
+            return sqlite3.sqlite_version_info >= (3, 35, 0)
+        return self.scheme == 'postgres'
+
+    def normalize_value(self, field, v):
+        if isinstance(v, dict):
+            v = json.dumps(v)
+        if isinstance(v, list):
+            if self.table_schema[field]['type'] == 'jsonb':
+                v = json.dumps(v)
+        if isinstance(v, np.bool_):
+            v = bool(v)
+        if isinstance(v, np.datetime64) and np.isnat(v):
+            v = None
+        if isinstance(v, pd.Timestamp) and self.scheme in ['mysql', 'sqlite']:
+            v = v.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(v, type(pd.NaT)):
+            v = None
+        if isinstance(v, float) and np.isnan(v):
+            v = None
+        return v
+
+    @memoized_property
+    def rows(self):
+        return [
+            [self.normalize_value(k, v) for (k, v) in zip(self.fields, row)]
+            for row in self.write_values.itertuples(index=False, name=None)
+            ]
+
     @memoized_property
     def values_list(self):
         all_values = []
 
-        for idx, val in self.write_values.iterrows():
+        for idx, row in enumerate(self.rows):
             values = collections.OrderedDict()
-
-            for k, v in val.iteritems():
-                if isinstance(v, dict):
-                    v = json.dumps(v)
-                if isinstance(v, list):
-                    if self.table_schema[k]['type'] == 'jsonb':
-                        v = json.dumps(v)
-                if isinstance(v, np.bool_):
-                    v = bool(v)
-                if isinstance(v, np.datetime64) and np.isnat(v):
-                    v = None
-                if isinstance(v, pd.Timestamp) and self.scheme in ['mysql', 'sqlite']:
-                    v = v.strftime('%Y-%m-%d %H:%M:%S')
-                if isinstance(v, type(pd.NaT)):
-                    v = None
-                if isinstance(v, float) and np.isnan(v):
-                    v = None
-
+            for k, v in zip(self.fields, row):
                 values['%s_%s' % (k, idx)] = v
-
             all_values += [values]
         return all_values
 
@@ -325,13 +561,206 @@ class InsertQueryBuilder(WriteQueryBuilder):
                     [self.list_wrap(ext) for ext in self.value_extrapolators]
                 )
             ]
-        if self.scheme == 'postgres':
-            query += ['RETURNING', self.primary_key]
+        query += self.conflict_clause
+        if self.returning:
+            query += ['RETURNING *']
         query = ' '.join(query) + ';'
         query = self.apply_watermark(query)
         return (query, self.values)
 
 
+    @memoized_property
+    def conflict_clause(self):
+        return []
+
+
+class UpsertQueryBuilder(InsertQueryBuilder):
+    """
+    Inserts rows, updating the existing ones which conflict on the ``conflict`` columns.
+    """
+
+    @memoized_property
+    def conflict(self):
+        return list(self.kwargs['conflict'])
+
+    @memoized_property
+    def update_columns(self):
+        if self.kwargs.get('update') is not None:
+            return list(self.kwargs['update'])
+        excluded = self.conflict + [self.primary_key, 'created_at']
+        return [f for f in self.fields if f not in excluded]
+
+    @memoized_property
+    def conflict_clause(self):
+        return [self.lexicon.upsert_clause(self.conflict, self.update_columns, self.primary_key)]
+
+
+class BulkWriteQueryBuilder(WriteQueryBuilder):
+    """
+    Base class for builders writing one chunk of a bulk operation. No rows are returned.
+    """
+
+    METHODS = ()
+    DEFAULT_METHODS = {}
+    DEFAULT_METHOD = None
+
+    @memoized_property
+    def method(self):
+        method = self.kwargs.get('method') or self.DEFAULT_METHODS.get(self.scheme, self.DEFAULT_METHOD)
+        if method not in self.METHODS:
+            raise ValueError('Unknown method %s, use one of %s' % (method, ', '.join(self.METHODS)))
+        if method == 'copy' and self.scheme != 'postgres':
+            raise ValueError('Method copy is only supported by PostgreSQL')
+        return method
+
+    @memoized_property
+    def executemany_params(self):
+        return [
+            self.lexicon.format_args(collections.OrderedDict(zip(self.fields, row)))
+            for row in self.rows
+            ]
+
+
+class BulkInsertQueryBuilder(BulkWriteQueryBuilder):
+
+    METHODS = ('values', 'executemany', 'copy')
+    DEFAULT_METHODS = {
+        'postgres': 'copy',
+        'mysql': 'executemany',
+        'sqlite': 'executemany'
+        }
+    DEFAULT_METHOD = 'values'
+
+    @staticmethod
+    def copy_scalar(v):
+        if isinstance(v, (bool, np.bool_)):
+            return 'true' if v else 'false'
+        if isinstance(v, numbers.Integral):
+            return str(int(v))
+        if isinstance(v, numbers.Real):
+            # Nullable integer columns come as floats, e.g. 1.0, which integer columns reject
+            return str(int(v)) if float(v).is_integer() else repr(float(v))
+        return None
+
+    @classmethod
+    def copy_array(cls, values):
+        elements = []
+        for v in values:
+            if v is None:
+                elements += ['NULL']
+            elif isinstance(v, (list, tuple)):
+                elements += [cls.copy_array(v)]
+            else:
+                scalar = cls.copy_scalar(v)
+                if scalar is None:
+                    scalar = '"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                elements += [scalar]
+        return '{' + ','.join(elements) + '}'
+
+    @classmethod
+    def copy_field(cls, v):
+        if v is None:
+            return ''
+        scalar = cls.copy_scalar(v)
+        if scalar is not None:
+            return scalar
+        if isinstance(v, (list, tuple)):
+            v = cls.copy_array(v)
+        return '"' + str(v).replace('"', '""') + '"'
+
+    @memoized_property
+    def copy_data(self):
+        return ''.join(
+            [','.join([self.copy_field(v) for v in row]) + '\n' for row in self.rows]
+            )
+
+    @memoized_property
+    def query(self):
+        insert = ['INSERT INTO', self.table_name, self.list_wrap(self.fields), 'VALUES']
+        if self.method == 'copy':
+            query = ' '.join(['COPY', self.table_name, self.list_wrap(self.fields), 'FROM STDIN WITH (FORMAT csv)'])
+            return (self.apply_watermark(query), self.copy_data)
+        if self.method == 'executemany':
+            # No watermark: a leading comment stops pymysql from batching the rows.
+            query = ' '.join(insert + [self.list_wrap([self.extrapolator(f) for f in self.fields])])
+            return (query, self.executemany_params)
+        query = insert + [', '.join([self.list_wrap(ext) for ext in self.value_extrapolators])]
+        query = self.apply_watermark(' '.join(query) + ';')
+        return (query, self.lexicon.format_args(self.values))
+
+
+class BulkUpdateQueryBuilder(BulkWriteQueryBuilder):
+    """
+    Updates each row matching the ``key`` column of a chunk with its own values.
+    """
+
+    METHODS = ('values', 'case', 'executemany')
+    DEFAULT_METHODS = {
+        'postgres': 'values',
+        'sqlite': 'executemany'
+        }
+    DEFAULT_METHOD = 'case'
+
+    def __init__(self, **kwargs):
+        super(BulkUpdateQueryBuilder, self).__init__(**kwargs)
+        self.params = collections.OrderedDict()
+
+    @memoized_property
+    def key(self):
+        return self.kwargs.get('key') or self.primary_key
+
+    @memoized_property
+    def columns(self):
+        return [f for f in self.fields if f != self.key]
+
+    def bind(self, value):
+        key = 'val_%s' % len(self.params)
+        self.params[key] = value
+        return self.extrapolator(key)
+
+    def cast(self, expression, field):
+        sql_type = self.table_schema.get(field, {}).get('type')
+        if sql_type is None or sql_type in ('ARRAY', 'USER-DEFINED'):
+            return expression
+        return 'CAST(%s AS %s)' % (expression, PG_UNBOUNDED_TYPES.get(sql_type, sql_type))
+
+    @memoized_property
+    def values_query(self):
+        rows = [self.list_wrap([self.bind(v) for v in row]) for row in self.rows]
+        sets = ['%s = %s' % (c, self.cast('v.' + c, c)) for c in self.columns]
+        return ' '.join([
+            'UPDATE', self.table_name,
+            'SET', ', '.join(sets),
+            'FROM (VALUES', ', '.join(rows) + ')',
+            'AS v', self.list_wrap(self.fields),
+            'WHERE', '%s.%s = %s' % (self.table_name, self.key, self.cast('v.' + self.key, self.key))
+            ]) + ';'
+
+    @memoized_property
+    def case_query(self):
+        key_index = list(self.fields).index(self.key)
+        sets = []
+        for (idx, column) in enumerate(self.fields):
+            if column == self.key:
+                continue
+            whens = ['WHEN %s THEN %s' % (self.bind(row[key_index]), self.bind(row[idx])) for row in self.rows]
+            sets += ['%s = CASE %s %s ELSE %s END' % (column, self.key, ' '.join(whens), column)]
+        keys = self.list_wrap([self.bind(row[key_index]) for row in self.rows])
+        return ' '.join(['UPDATE', self.table_name, 'SET', ', '.join(sets), 'WHERE', self.key, 'IN', keys]) + ';'
+
+    @memoized_property
+    def query(self):
+        if self.method == 'executemany':
+            sets = ['%s = %s' % (c, self.extrapolator(c)) for c in self.columns]
+            query = ' '.join(['UPDATE', self.table_name, 'SET', ', '.join(sets), 'WHERE', self.key, '=', self.extrapolator(self.key)])
+            return (query, self.executemany_params)
+        if self.method == 'values':
+            query = self.values_query
+        else:
+            query = self.case_query
+        return (self.apply_watermark(query), self.lexicon.format_args(self.params))
+
+
 class UpdateQueryBuilder(WriteQueryBuilder, SelectQueryBuilder):
 
     @memoized_property
@@ -340,8 +769,8 @@ class UpdateQueryBuilder(WriteQueryBuilder, SelectQueryBuilder):
         query += self.lexicon.update_values(self.fields, self.value_extrapolators)
 
         if self.wheres: query += " WHERE " + self.wheres
-        if self.scheme == 'postgres':
-            query += ' RETURNING ' + self.primary_key
+        if self.returning:
+            query += ' RETURNING *'
 
         query += ';'
         query = self.apply_watermark(query)
@@ -365,19 +794,18 @@ class RawQueryBuilder(WriteQueryBuilder, SelectQueryBuilder):
         return key
 
     @memoized_property
-    def sql(self):
-        if 'sql' in self.kwargs and self.kwargs['sql']:
-            raw_sql = self.kwargs['sql']
+    def template(self):
+        # Files are parsed once per lexicon, until they change
         if 'filename' in self.kwargs and self.kwargs['filename']:
-            with open(self.kwargs['filename']) as file:
-                raw_sql = file.read()
-        return raw_sql
+            return SqlTemplates.get(self.kwargs['filename'], self.lexicon)
+        return self.lexicon.parse_interpolators(self.kwargs['sql'])
 
     @memoized_property
     def query(self):
-        query = self.apply_watermark(self.sql)
+        sql, names = self.template
+        query = self.apply_watermark(sql)
         params = self.kwargs.get('where', self.kwargs.get('params', {}))
         for (k, v) in params.items():
             self.add_to_where_values(k, v)
-        query, params = self.lexicon.standardize_interpolators(query, self.where_values)
+        params = self.lexicon.bind_interpolators(names, self.where_values)
         return (query, params)
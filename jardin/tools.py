@@ -1,16 +1,68 @@
 import itertools
+import os
+import pandas
+import random
+import sys
 from operator import is_not
 from functools import partial, wraps
 from jardin.database.datasources import Datasources
+from jardin.identity_map import IdentityMap
+import jardin.config as config
 import time
 
 
+JARDIN_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+# Formatted call-site markers indexed by (code object, line number, db name).
+# There is one entry per call site; the dict is emptied when it reaches
+# CALL_SITE_MARKERS_SIZE entries, e.g. with code objects compiled at runtime.
+CALL_SITE_MARKERS_SIZE = 10000
+_call_site_markers = {}
+
+
 def stack_marker(stack, db_conn=None):
     filename, line_number, function_name = stack[1][1:4]
     stack = [db_conn.name] if db_conn else []
     stack += [filename, function_name, str(line_number)]
     return ':'.join(stack)
 
+def caller_frame(depth=1):
+    """
+    Returns the first frame above ``depth`` that does not belong to jardin itself.
+    Unlike ``inspect.stack()``, no source context is read.
+    """
+    frame = sys._getframe(depth + 1)
+    caller = frame
+    while caller is not None and caller.f_code.co_filename.startswith(JARDIN_DIR):
+        caller = caller.f_back
+    return caller or frame
+
+def frame_marker(frame, db_conn=None):
+    db_name = db_conn.name if db_conn else None
+    key = (frame.f_code, frame.f_lineno, db_name)
+    marker = _call_site_markers.get(key)
+    if marker is None:
+        marker = [db_name] if db_name else []
+        marker += [frame.f_code.co_filename, frame.f_code.co_name, str(frame.f_lineno)]
+        marker = ':'.join(marker)
+        if len(_call_site_markers) >= CALL_SITE_MARKERS_SIZE:
+            _call_site_markers.clear()
+        _call_site_markers[key] = marker
+    return marker
+
+def watermark_marker(db_conn=None, mode=None):
+    """
+    Returns the call-site marker used to watermark queries according to ``WATERMARK_MODE``:
+    ``'frame'`` marks every query, ``'sampled'`` marks a ``WATERMARK_SAMPLE_RATE`` fraction of them
+    and ``'off'`` disables call-site markers.
+    """
+    mode = mode or config.WATERMARK_MODE
+    if mode == 'off':
+        return ''
+    if mode == 'sampled' and random.random() >= config.WATERMARK_SAMPLE_RATE:
+        return ''
+    return frame_marker(caller_frame(), db_conn=db_conn)
+
 class classorinstancemethod(object):
     def __init__(self, method):
         self.method = method
@@ -55,7 +107,7 @@ def soft_del(func):
 
 def add_soft_delete(kwargs, deleted_at_column):
     if not is_in_where(kwargs.get('where', {}), deleted_at_column):
-        kwargs['where'] = kwargs.get('where', {})
+        kwargs['where'] = kwargs.get('where') or {}
         kwargs['where'] = add_to_where(
             kwargs['where'],
             {deleted_at_column: None}
@@ -67,8 +119,27 @@ def grouper(iterable, n, fillvalue=None):
   args = [iter(iterable)] * n
   return itertools.izip_longest(fillvalue=fillvalue, *args)
 
+def chunks(values, chunksize):
+    """
+    Yields ``values`` as DataFrames of at most ``chunksize`` rows.
+    ``values`` can be a DataFrame, a dict or any iterable of dicts, which is consumed lazily.
+    """
+    if isinstance(values, pandas.DataFrame):
+        for start in range(0, len(values), chunksize):
+            yield values.iloc[start:start + chunksize]
+        return
+    if isinstance(values, dict):
+        values = [values]
+    iterator = iter(values)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield pandas.DataFrame(chunk)
+
 def remove_none(res):
   return filter(partial(is_not, None), res)
 
 def reset_session():
     Datasources.shuffle_clients()
+    IdentityMap.clear()
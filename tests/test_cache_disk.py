@@ -97,8 +97,19 @@ class TestDisk(unittest.TestCase):
                 df2 = jardin.query("select * from users limit 10", db="jardin_test", cache=True, cache_method="disk", ttl=1)
                 assert_frame_equal(df1, df2, check_like=True)
                 self.assertEqual(mock_method.call_count, 2)
-                
-                
+            jardin.cache_stores.STORES["disk"].clear()
+
+            if not hasattr(pd, 'ArrowDtype'):
+                return
+            # with arrow-backed dtypes
+            with patch.object(BaseClient, 'execute', return_value=(results, columns)) as mock_method:
+                df1 = jardin.query("select * from users limit 10", db="jardin_test", cache=True, cache_method="disk", dtype_backend="pyarrow")
+                df2 = jardin.query("select * from users limit 10", db="jardin_test", cache=True, cache_method="disk", dtype_backend="pyarrow")
+                self.assertEqual(str(df2.a.dtype), 'int64[pyarrow]')
+                assert_frame_equal(df1, df2)
+                self.assertEqual(mock_method.call_count, 1)
+            jardin.cache_stores.STORES["disk"].clear()
+
     def test_multi_threading_cache_query_with_disk(self):
         with TestTransaction(User):
             User.insert(values={'name': 'jardin_disk'})
@@ -0,0 +1,66 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from jardin import codegen
+from jardin.database.schema_cache import SchemaCache
+
+from tests import transaction
+from tests.models import JardinTestModel
+from tests.query_tracer import QueryTracer
+
+
+class User(JardinTestModel):
+    pass
+
+
+class TestCodegen(unittest.TestCase):
+
+    def setUp(self):
+        SchemaCache.get('jardin_test').clear()
+
+    def tearDown(self):
+        SchemaCache.get('jardin_test').clear()
+        User.clear_caches()
+
+    def test_class_name(self):
+        self.assertEqual(codegen.class_name('users'), 'User')
+        self.assertEqual(codegen.class_name('jardin_users'), 'JardinUser')
+
+    @transaction(model=User)
+    def test_generate(self):
+        source = codegen.generate('jardin_test', tables=['users'])
+        namespace = {}
+        exec(compile(source, 'models.py', 'exec'), namespace)
+        GeneratedUser = namespace['User']
+        SchemaCache.get('jardin_test').clear()
+        self.assertEqual(GeneratedUser.table_name, 'users')
+        self.assertEqual(GeneratedUser.db_names, {'master': 'jardin_test', 'replica': 'jardin_test'})
+        with QueryTracer():
+            self.assertEqual(GeneratedUser.table_schema()['name']['type'], 'varchar(256)')
+            self.assertIsNone(GeneratedUser.table_schema()['id']['default'])
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 0)
+        with QueryTracer():
+            GeneratedUser.insert(values={'name': 'jardin'})
+            self.assertEqual(GeneratedUser.count(), 1)
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 2)
+
+    @transaction(model=User)
+    def test_main(self):
+        path = os.path.join(tempfile.mkdtemp(), 'models.py')
+        codegen.main(['--db', 'jardin_test', '--table', 'users', '--base', 'tests.models.JardinTestModel', '--output', path])
+        with open(path) as f:
+            source = f.read()
+        self.assertIn('from tests.models import JardinTestModel', source)
+        self.assertIn('class User(JardinTestModel):', source)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            codegen.main(['--db', 'jardin_test', '--table', 'users', '--base', 'tests.models.JardinTestModel'])
+        self.assertEqual(out.getvalue(), source)
+        self.assertRaises(ValueError, codegen.generate, 'jardin_test', tables=['unknown_tables'])
+
+
+if __name__ == "__main__":
+    unittest.main()
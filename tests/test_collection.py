@@ -34,12 +34,60 @@ class TestCollection(unittest.TestCase):
             User
             )
 
+    def test_concat_is_not_patched(self):
+        self.assertEqual(pandas.concat.__module__, 'pandas.core.reshape.concat')
+        df = pandas.concat([User.collection_instance({'a': [0]}), pandas.DataFrame({'a': [1]})])
+        self.assertIsInstance(df, UserCollection)
+        self.assertEqual(df.model_class, User)
+
     def test_append(self):
         self.assertEqual(
             User.collection_instance().append(User.collection_instance()).model_class,
             User
             )
 
+    def test_index_by(self):
+        users = User.collection_instance({'id': [1, 2, 3, 4], 'name': ['John', 'Paul', 'John', None]})
+        indexed = users.index_by('name')
+        self.assertEqual(sorted(indexed.keys()), ['John', 'Paul'])
+        self.assertIsInstance(indexed['John'], User)
+        self.assertEqual(indexed['John'].id, 1)
+        self.assertEqual(indexed['Paul'].name, 'Paul')
+
+    def test_group_by(self):
+        users = User.collection_instance({'id': [1, 2, 3, 4], 'name': ['John', 'Paul', 'John', None]})
+        grouped = users.group_by('name')
+        self.assertEqual(sorted(grouped.keys()), ['John', 'Paul'])
+        self.assertEqual([u.id for u in grouped['John']], [1, 3])
+        self.assertIsInstance(grouped['Paul'][0], User)
+        grouped = users.group_by('name', collections=True)
+        self.assertIsInstance(grouped['John'], UserCollection)
+        self.assertEqual(grouped['John'].id.tolist(), [1, 3])
+        self.assertEqual(grouped['John'].model_class, User)
+
+    def test_records(self):
+        users = User.collection_instance({'id': [1, 2], 'name': ['John', 'Paul']})
+        records = users.records()
+        self.assertIs(iter(records), records)
+        record = next(records)
+        self.assertIsInstance(record, User)
+        self.assertEqual(record.name, 'John')
+        self.assertIs(type(record.id), int)
+        self.assertEqual([r.id for r in records], [2])
+        self.assertEqual(records.current, 2)
+
+    def test_records_view(self):
+        users = User.collection_instance({'id': [1, 2], 'name': ['John', 'Paul']})
+        views = list(users.records(view=True))
+        self.assertEqual([v.name for v in views], ['John', 'Paul'])
+        self.assertEqual(views[1]['id'], 2)
+        self.assertEqual(views[0].attributes, {'id': 1, 'name': 'John'})
+        self.assertRaises(AttributeError, getattr, views[0], 'unknown')
+        self.assertRaises(AttributeError, setattr, views[0], 'name', 'George')
+        record = views[1].to_record()
+        self.assertIsInstance(record, User)
+        self.assertEqual(record.name, 'Paul')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from threading import Thread
+
+import jardin
+import jardin.config as config
+
+from tests import transaction
+from tests.models import JardinTestModel
+from tests.query_tracer import QueryTracer
+from tests.test_instrumentation import TestSubscriber
+
+
+class User(JardinTestModel):
+    identity_map = True
+
+
+class UncachedUser(JardinTestModel):
+    table_name = 'users'
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    def setUp(self):
+        jardin.reset_session()
+        self.subscriber = TestSubscriber()
+        self.notifier_id = config.notifier.subscribe(self.subscriber)
+
+    def tearDown(self):
+        config.notifier.unsubscribe(self.notifier_id)
+        jardin.reset_session()
+
+    def queries(self):
+        return len(QueryTracer.get_report()['query_list'])
+
+    def events(self, name):
+        return len([e for e in self.subscriber.published_events if e.name == name])
+
+    @transaction(model=User)
+    def test_find(self):
+        user = User.insert(values={'name': 'jardin'})
+        with QueryTracer():
+            found = User.find(user.id)
+            self.assertEqual(self.queries(), 1)
+            again = User.find(user.id)
+            self.assertEqual(User.find_by(values={'id': user.id}).name, 'jardin')
+            self.assertEqual(self.queries(), 1)
+        self.assertEqual(again.attributes, found.attributes)
+        self.assertIsNot(again, found)
+        again.name = 'changed'
+        self.assertEqual(User.find(user.id).name, 'jardin')
+        self.assertEqual(self.events('identity_map_miss'), 1)
+        self.assertEqual(self.events('identity_map_hit'), 3)
+
+    @transaction(model=User)
+    def test_other_queries_are_not_cached(self):
+        user = User.insert(values={'name': 'jardin'})
+        UncachedUser.table_schema()
+        with QueryTracer():
+            User.find_by(values={'name': 'jardin'})
+            User.find_by(values={'name': 'jardin'})
+            User.find(user.id, select='id')
+            User.find(user.id, select='id')
+            UncachedUser.find(user.id)
+            UncachedUser.find(user.id)
+            self.assertEqual(self.queries(), 6)
+        self.assertIsNone(User.find(-1))
+        self.assertIsNone(User.find(-1))
+        self.assertEqual(self.events('identity_map_miss'), 2)
+
+    @transaction(model=User)
+    def test_writes_invalidate(self):
+        user = User.insert(values={'name': 'jardin'})
+        User.find(user.id)
+        User.update(values={'name': 'updated'}, where={'id': user.id})
+        self.assertEqual(User.find(user.id).name, 'updated')
+        record = User.find(user.id)
+        record.name = 'saved'
+        record.save()
+        self.assertEqual(User.find(user.id).name, 'saved')
+        UncachedUser.update(values={'name': 'other model'}, where={'id': user.id})
+        self.assertEqual(User.find(user.id).name, 'other model')
+        User.delete(where={'id': user.id})
+        self.assertIsNone(User.find(user.id))
+
+    @transaction(model=User)
+    def test_reload_reads_the_row(self):
+        user = User.insert(values={'name': 'jardin'})
+        record = User.find(user.id)
+        User.query(sql="UPDATE users SET name = 'changed' WHERE id = %d" % user.id)
+        self.assertEqual(User.find(user.id).name, 'jardin')
+        record.reload()
+        self.assertEqual(record.name, 'changed')
+        with QueryTracer():
+            self.assertEqual(User.find(user.id).name, 'changed')
+            self.assertEqual(self.queries(), 0)
+
+    @transaction(model=User)
+    def test_reset_session(self):
+        user = User.insert(values={'name': 'jardin'})
+        User.find(user.id)
+        thread = Thread(target=jardin.reset_session)
+        thread.start()
+        thread.join()
+        with QueryTracer():
+            User.find(user.id)
+            self.assertEqual(self.queries(), 0)
+        jardin.reset_session()
+        with QueryTracer():
+            User.find(user.id)
+            self.assertEqual(self.queries(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
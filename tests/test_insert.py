@@ -1,10 +1,14 @@
 import unittest
+from unittest import mock
 from datetime import datetime
 import pandas
 import numpy
 from tests import transaction, only_schemes
 from tests.models import JardinTestModel
 from jardin.query import query
+from jardin import config
+from tests.test_instrumentation import TestSubscriber
+from tests.query_tracer import QueryTracer
 
 
 class User(JardinTestModel):
@@ -55,5 +59,149 @@ class TestInsert(unittest.TestCase):
         User.insert(values={'ids': ['a', 'b', 'c']})
         self.assertEqual(User.count(), 1)
 
+    @transaction(model=User)
+    def test_insert_single_round_trip(self):
+        if User.db().config.scheme == 'mysql':
+            return
+        User.table_schema()
+        with QueryTracer():
+            user = User.insert(values={'name': 'user'})
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 1)
+        self.assertEqual(user.name, 'user')
+        self.assertIsNotNone(user.id)
+        self.assertIsNotNone(user.created_at)
+
+    @transaction(model=User)
+    def test_insert_without_returning(self):
+        self.assertIsNone(User.insert(values={'name': 'user'}, returning=False))
+        self.assertEqual(User.count(), 1)
+        self.assertIsNone(User.update(values={'name': 'user2'}, where={'name': 'user'}, returning=False))
+        self.assertEqual(User.count(where={'name': 'user2'}), 1)
+        user = User(name='user3')
+        user.save(returning=False)
+        self.assertFalse(user.persisted)
+        self.assertEqual(User.count(), 2)
+
+    @transaction(model=User)
+    def test_upsert(self):
+        user = User.upsert({'id': 1, 'name': 'user'}, conflict=['id'])
+        self.assertEqual(user.name, 'user')
+        created_at = user.created_at
+        user = User.upsert({'id': 1, 'name': 'renamed'}, conflict=['id'])
+        self.assertEqual(User.count(), 1)
+        self.assertEqual(User.find(1).name, 'renamed')
+        self.assertEqual(User.find(1).created_at, created_at)
+
+    @transaction(model=User)
+    def test_upsert_dataframe(self):
+        query('CREATE UNIQUE INDEX users_name ON users (name);', db='jardin_test')
+        User.insert(values={'name': 'a', 'num': 1})
+        df = pandas.DataFrame({'name': ['a', 'b', 'c', 'c'], 'num': [10, 20, 30, 31]})
+        User.upsert(df, conflict=['name'], chunksize=2, returning=False)
+        users = User.select(order='name')
+        self.assertEqual(users.name.tolist(), ['a', 'b', 'c'])
+        self.assertEqual(users.num.astype(int).tolist(), [10, 20, 31])
+
+    @transaction(model=User)
+    def test_upsert_duplicates_across_chunks(self):
+        users = User.upsert(
+            [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 1, 'name': 'c'}],
+            conflict=['id'], chunksize=1
+            )
+        self.assertEqual(sorted(users.name.tolist()), ['b', 'c'])
+        self.assertEqual(User.find(1).name, 'c')
+
+    @transaction(model=User)
+    def test_upsert_without_returning_clause(self):
+        # As on MySQL, whose statements cannot return the upserted rows
+        User.insert(values={'id': 1, 'name': 'a', 'num': 1})
+        values = [{'id': 1, 'name': 'a', 'num': 10}, {'id': 2, 'name': 'b', 'num': 20}, {'id': 3, 'name': 'c', 'num': 30}]
+        with mock.patch('jardin.query_builders.UpsertQueryBuilder.returning', False):
+            users = User.upsert(values, conflict=['id'])
+            self.assertEqual(sorted(users.num.astype(int).tolist()), [10, 20, 30])
+            query('CREATE UNIQUE INDEX users_name_num ON users (name, num);', db='jardin_test')
+            users = User.upsert(values[:2], conflict=['name', 'num'])
+            self.assertEqual(sorted(users.id.tolist()), [1, 2])
+
+    @transaction(model=User)
+    def test_upsert_do_nothing(self):
+        User.insert(values={'id': 1, 'name': 'user'})
+        User.upsert({'id': 1, 'name': 'renamed'}, conflict=['id'], update=[], returning=False)
+        self.assertEqual(User.find(1).name, 'user')
+
+    @transaction(model=User)
+    def test_bulk_insert_records(self):
+        records = ({'name': 'user%d' % i, 'num': i} for i in range(5))
+        self.assertEqual(User.bulk_insert(records, chunksize=2), 5)
+        self.assertEqual(User.count(), 5)
+        users = User.select(order='id')
+        self.assertEqual(users.name.tolist(), ['user%d' % i for i in range(5)])
+        self.assertEqual(users.created_at.isnull().sum(), 0)
+
+    @transaction(model=User)
+    def test_bulk_insert_values(self):
+        df = pandas.DataFrame({'name': ['a', None, 'c'], 'num': [1.5, numpy.nan, 3]})
+        self.assertEqual(User.bulk_insert(df, chunksize=2, method='values'), 3)
+        self.assertEqual(User.count(), 3)
+        self.assertEqual(User.count(where={'name': None}), 1)
+
+    @transaction(model=User)
+    def test_bulk_insert_copy(self):
+        if User.db().config.scheme != 'postgres':
+            return
+        df = pandas.DataFrame({'name': ['a', '', 'c"d', None], 'num': [1, 2, 3, None]})
+        self.assertEqual(User.bulk_insert(df, method='copy'), 4)
+        users = User.select(order='id')
+        self.assertEqual(users.name.tolist()[:3], ['a', '', 'c"d'])
+        self.assertIsNone(users.name.tolist()[3])
+
+    @transaction(model=User)
+    def test_bulk_insert_executemany_is_atomic(self):
+        if User.db().config.scheme != 'sqlite':
+            return
+        with self.assertRaises(Exception):
+            User.bulk_insert([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 1, 'name': 'c'}])
+        self.assertEqual(User.count(), 0)
+        self.assertEqual(User.bulk_insert([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]), 2)
+        self.assertEqual(User.count(), 2)
+
+    def test_copy_field(self):
+        from jardin.query_builders import BulkInsertQueryBuilder
+        self.assertEqual(BulkInsertQueryBuilder.copy_field(None), '')
+        self.assertEqual(BulkInsertQueryBuilder.copy_field(1.0), '1')
+        self.assertEqual(BulkInsertQueryBuilder.copy_field(numpy.int64(2)), '2')
+        self.assertEqual(BulkInsertQueryBuilder.copy_field(1.5), '1.5')
+        self.assertEqual(BulkInsertQueryBuilder.copy_field(True), 'true')
+        self.assertEqual(BulkInsertQueryBuilder.copy_field('c"d'), '"c""d"')
+        self.assertEqual(
+            BulkInsertQueryBuilder.copy_field(['a', 'b "c"', None, [1, 2.0]]),
+            '"{""a"",""b \\""c\\"""",NULL,{1,2}}"'
+            )
+
+    @transaction(model=User)
+    def test_bulk_insert_copy_unsupported(self):
+        if User.db().config.scheme == 'postgres':
+            return
+        with self.assertRaises(ValueError):
+            User.bulk_insert([{'name': 'user'}], method='copy')
+
+    @transaction(model=User)
+    def test_bulk_insert_instrumentation(self):
+        subscriber = TestSubscriber()
+        subscriber_id = config.notifier.subscribe(subscriber)
+        try:
+            User.bulk_insert([{'name': 'user'}] * 3)
+        finally:
+            config.notifier.unsubscribe(subscriber_id)
+        events = [e for e in subscriber.published_events if e.name == 'bulk_insert']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].tags['rows'], 3)
+        self.assertIn('rows_per_second', events[0].tags)
+
+    @transaction(model=User)
+    def test_bulk_insert_unknown_method(self):
+        with self.assertRaises(ValueError):
+            User.bulk_insert([{'name': 'user'}], method='unknown')
+
 if __name__ == "__main__":
     unittest.main()
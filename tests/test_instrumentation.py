@@ -63,6 +63,16 @@ class TestInstrumentation(unittest.TestCase):
                 found_query_event = True
         self.assertTrue(found_query_event)
 
+    def test_query_memory_usage(self):
+        adapter = DatabaseAdapter(ClientProvider('jardin_test'), None)
+        adapter.raw_query(sql="SELECT 1 AS a")
+        self.assertNotIn('memory_usage', self.query_events()[-1].tags)
+        df = adapter.raw_query(sql="SELECT 1 AS a", compact=True)
+        self.assertEqual(self.query_events()[-1].tags['memory_usage'], df.memory_usage(deep=True).sum())
+
+    def query_events(self):
+        return [event for event in self.subscriber.published_events if event.name == "query"]
+
 
 if __name__ == "__main__":
     unittest.main()
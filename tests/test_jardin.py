@@ -1,9 +1,14 @@
 import unittest
+from unittest import mock
 from time import sleep
 from freezegun import freeze_time
 from datetime import datetime, timedelta
 import pandas as pd
+import pyarrow as pa
+from decimal import Decimal
 
+import jardin.config as config
+from jardin.database.results import build_frame, compact_frame
 from tests import transaction
 from tests.models import JardinTestModel
 
@@ -68,6 +73,275 @@ class TestModel(unittest.TestCase):
         User.insert(values={'name': 'Holberton'})
         self.assertEqual(User.count(select='DISTINCT(name)'), 1)
 
+    @transaction(model=User)
+    def test_bulk_update(self):
+        User.bulk_insert([{'name': 'user%d' % i, 'num': i} for i in range(5)])
+        users = User.select(select=['id', 'name', 'num'], order='id')
+        users['name'] = ['renamed%d' % i for i in range(5)]
+        users['num'] = users.num * 10
+        methods = [None, 'case']
+        if User.db().config.scheme == 'postgres':
+            methods += ['values']
+        for method in methods:
+            self.assertEqual(User.bulk_update(users, chunksize=2, method=method), 5)
+            updated = User.select(order='id')
+            self.assertEqual(updated.name.tolist(), users.name.tolist())
+            self.assertEqual(updated.num.astype(int).tolist(), [0, 10, 20, 30, 40])
+            self.assertEqual(updated.updated_at.isnull().sum(), 0)
+
+    @transaction(model=User)
+    def test_bulk_update_columns(self):
+        User.bulk_insert([{'name': 'user%d' % i, 'num': i} for i in range(3)])
+        users = User.select(select=['id', 'name', 'num'], order='id')
+        users['name'] = 'renamed'
+        users['num'] = 0
+        User.bulk_update(users, columns=['num'])
+        updated = User.select(order='id')
+        self.assertEqual(updated.name.tolist(), ['user0', 'user1', 'user2'])
+        self.assertEqual(updated.num.astype(int).tolist(), [0, 0, 0])
+
+    def test_bulk_update_values_casts(self):
+        from jardin.database.clients.pg import Lexicon as PGLexicon
+        from jardin.query_builders import BulkUpdateQueryBuilder
+        _, _, mood = PGLexicon.column_info({
+            'column_name': 'mood', 'column_default': None, 'data_type': 'USER-DEFINED',
+            'udt_schema': 'public', 'udt_name': 'mood'
+            })
+        table_schema = {
+            'code': {'type': 'character'},
+            'flags': {'type': 'bit'},
+            'mood': {'type': mood},
+            'num': {'type': 'integer'}
+            }
+        builder = BulkUpdateQueryBuilder(
+            model_metadata={'table_name': 'items', 'table_schema': table_schema},
+            scheme='postgres',
+            lexicon=PGLexicon,
+            values=pd.DataFrame({'code': ['abc'], 'flags': ['101'], 'mood': ['happy'], 'num': [1]}),
+            key='code',
+            method='values'
+            )
+        query = builder.query[0]
+        self.assertIn('flags = CAST(v.flags AS bit varying)', query)
+        self.assertIn('mood = CAST(v.mood AS "public"."mood")', query)
+        self.assertIn('num = CAST(v.num AS integer)', query)
+        self.assertIn('items.code = CAST(v.code AS character varying)', query)
+
+    @transaction(model=User)
+    def test_select_iter(self):
+        User.bulk_insert([{'name': 'user%d' % i} for i in range(5)])
+        chunks = list(User.select_iter(chunksize=2, order='id'))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0].model_class, User)
+        self.assertEqual(
+            pd.concat(chunks).name.tolist(),
+            ['user%d' % i for i in range(5)]
+            )
+        self.assertEqual(list(User.select_iter(where={'name': 'unknown'})), [])
+
+    @transaction(model=User)
+    def test_select_iter_errors_are_raised_before_iterating(self):
+        client = User.db().next_client()
+        self.assertRaises(Exception, client.execute_iter, 'SELECT * FROM missing_table;')
+
+    @transaction(model=User)
+    def test_select_iter_closes_dedicated_connection(self):
+        User.bulk_insert([{'name': 'user%d' % i} for i in range(3)])
+        client = User.db().next_client()
+        connect_impl = client.connect_impl
+        connections = []
+
+        def connect():
+            connections.append(mock.MagicMock(wraps=connect_impl()))
+            return connections[-1]
+
+        with mock.patch.object(client, 'dedicated_stream_connection', True), \
+                mock.patch.object(client, 'connect_impl', connect):
+            chunks = User.select_iter(chunksize=1)
+            self.assertEqual(len(next(chunks)), 1)
+            chunks.close()
+        self.assertEqual(len(connections), 1)
+        connections[0].close.assert_called_once_with()
+
+    @transaction(model=User)
+    def test_select_iter_soft_delete(self):
+        User.soft_delete = True
+        try:
+            User.insert(values={'name': 'user'})
+            User.insert(values={'name': 'deleted', 'deleted_at': datetime.utcnow()})
+            chunks = list(User.select_iter(chunksize=10))
+            self.assertEqual(len(chunks), 1)
+            self.assertEqual(chunks[0].name.tolist(), ['user'])
+        finally:
+            User.soft_delete = False
+
+    @transaction(model=User)
+    def test_find_in_batches(self):
+        User.bulk_insert([{'name': 'user%d' % i} for i in range(5)])
+        batches = list(User.find_in_batches(batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(
+            [n for b in batches for n in b.name.tolist()],
+            ['user%d' % i for i in range(5)]
+            )
+        batches = list(User.find_in_batches(batch_size=2, where={'name': ['user1', 'user2', 'user3']}))
+        self.assertEqual([len(b) for b in batches], [2, 1])
+
+    @transaction(model=User)
+    def test_find_in_batches_scopes_and_soft_delete(self):
+        User.bulk_insert([{'name': 'user%d' % i, 'num': i % 2} for i in range(6)])
+        User.update(values={'deleted_at': datetime.utcnow()}, where={'name': 'user1'})
+        User.soft_delete = True
+        User.scopes = {'odd': {'num': 1}}
+        User.clear_caches()
+        try:
+            batches = list(User.find_in_batches(batch_size=1, scopes=['odd']))
+            self.assertEqual([b.name.iloc[0] for b in batches], ['user3', 'user5'])
+        finally:
+            User.soft_delete = False
+            User.scopes = {}
+            User.clear_caches()
+
+    @transaction(model=User)
+    def test_find_each(self):
+        User.bulk_insert([{'name': 'user%d' % i} for i in range(3)])
+        records = list(User.find_each(batch_size=2))
+        self.assertEqual(len(records), 3)
+        self.assertIsInstance(records[0], User)
+        self.assertEqual([r.name for r in records], ['user0', 'user1', 'user2'])
+
+    @transaction(model=User)
+    def test_select_dtypes(self):
+        User.insert(values={'name': 'a', 'num': 1.5})
+        User.insert(values={'name': 'b'})
+        users = User.select(order='id')
+        self.assertEqual(users.id.dtype, 'int64')
+        self.assertEqual(users.num.dtype, 'float64')
+        self.assertEqual(users.name.dtype, 'object')
+        self.assertTrue(pd.isnull(users.num.iloc[1]))
+
+    def test_build_frame(self):
+        schema = {
+            'id': {'type': 'integer'},
+            'parent_id': {'type': 'bigint'},
+            'price': {'type': 'numeric'},
+            'active': {'type': 'boolean'},
+            'size': {'type': "enum('small','large')"},
+            }
+        rows = [(1, None, Decimal('1.5'), True, 'small', 'x'), (2, 3, None, False, 'large', 'y')]
+        columns = ['id', 'parent_id', 'price', 'active', 'size', 'other']
+        df = build_frame(rows, columns, schema)
+        self.assertEqual(
+            [str(t) for t in df.dtypes],
+            ['int64', 'float64', 'float64', 'bool', 'category', 'object']
+            )
+        self.assertEqual(list(df['size'].cat.categories), ['small', 'large'])
+        config.NULLABLE_INTEGERS = True
+        try:
+            df = build_frame(rows, columns, schema)
+            self.assertEqual(str(df.parent_id.dtype), 'Int64')
+        finally:
+            config.NULLABLE_INTEGERS = False
+        # values that do not match the schema are inferred
+        df = build_frame([('a', 'b', 1, None, 'small', 'x')], columns, schema)
+        self.assertEqual(
+            [str(t) for t in df.dtypes],
+            ['object', 'object', 'float64', 'object', 'category', 'object']
+            )
+        # integer columns holding other numbers are not truncated
+        df = build_frame([(1.5,), (2,)], ['id'], schema)
+        self.assertEqual(df.id.tolist(), [1.5, 2.0])
+        for values in ([2 ** 63 + 5, 1], [2 ** 63 + 5, None], [2 ** 64 - 1, -1]):
+            df = build_frame([(v,) for v in values], ['id'], {'id': {'type': 'bigint unsigned'}})
+            self.assertEqual(df.id.tolist()[0], values[0])
+        # enum labels are unescaped, values missing from them are not lost
+        enum_schema = {'word': {'type': "enum('it''s','b')"}}
+        df = build_frame([("it's",), ('b',)], ['word'], enum_schema)
+        self.assertEqual(list(df.word.cat.categories), ["it's", 'b'])
+        self.assertEqual(df.word.tolist(), ["it's", 'b'])
+        df = build_frame([('c',), ('b',), (None,)], ['word'], enum_schema)
+        self.assertEqual(df.word.tolist(), ['c', 'b', None])
+        self.assertTrue(build_frame(rows, columns).equals(
+            pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            ))
+
+    @transaction(model=User)
+    def test_select_arrow(self):
+        User.insert(values={'name': 'a', 'num': 1.5})
+        User.insert(values={'name': 'b'})
+        table = User.select(order='id', output='arrow')
+        self.assertIsInstance(table, pa.Table)
+        self.assertEqual(table.schema.field('id').type, pa.int64())
+        self.assertEqual(table.schema.field('name').type, pa.string())
+        self.assertEqual(table.schema.field('num').type, pa.float64())
+        self.assertEqual(table.column('num').to_pylist(), [1.5, None])
+        table = User.select(where={'name': 'c'}, output='arrow')
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn('name', table.column_names)
+        tables = list(User.select_iter(chunksize=1, output='arrow'))
+        self.assertEqual([t.num_rows for t in tables], [1, 1])
+        self.assertRaises(ValueError, User.select, output='parquet')
+        self.assertRaises(ValueError, User.select, output='arrow', includes=[User])
+
+    @unittest.skipUnless(hasattr(pd, 'ArrowDtype'), 'requires pandas 1.5 or later')
+    @transaction(model=User)
+    def test_select_arrow_backed(self):
+        User.insert(values={'name': 'a', 'num': 1.5})
+        User.insert(values={'name': 'b'})
+        users = User.select(order='id', dtype_backend='pyarrow')
+        self.assertIsInstance(users, User.collection_class)
+        self.assertEqual(str(users.name.dtype), 'string[pyarrow]')
+        self.assertEqual(str(users.id.dtype), 'int64[pyarrow]')
+        self.assertEqual(users.name.iloc[1:].tolist(), ['b'])
+        self.assertTrue(pd.isna(users.num.iloc[1]))
+        config.DTYPE_BACKEND = 'pyarrow'
+        try:
+            self.assertEqual(str(User.select().name.dtype), 'string[pyarrow]')
+            # only select and raw query results are backed by Arrow
+            self.assertEqual(User.insert(values={'name': 'c'}).name, 'c')
+            self.assertEqual(User.db_adapter().to_frame([('c',)], ['name']).name.dtype, object)
+        finally:
+            config.DTYPE_BACKEND = 'numpy'
+
+    @transaction(model=User)
+    def test_select_arrow_backed_requires_pandas_1_5(self):
+        with mock.patch.object(pd, 'ArrowDtype', None, create=True):
+            self.assertRaises(ValueError, User.select, dtype_backend='pyarrow')
+
+    @transaction(model=User)
+    def test_select_compact(self):
+        User.bulk_insert([{'name': 'user%d' % (i % 2), 'num': i} for i in range(10)])
+        users = User.select(compact=True, order='id')
+        self.assertEqual(str(users.name.dtype), 'category')
+        self.assertEqual(str(users.id.dtype), 'int8')
+        self.assertEqual(str(users.num.dtype), 'float32')
+        self.assertEqual(users.name.tolist(), ['user0', 'user1'] * 5)
+        self.assertEqual(users.num.tolist(), list(range(10)))
+        users = User.select(order='id')
+        self.assertEqual(users.name.dtype, 'object')
+        config.COMPACT = True
+        try:
+            self.assertEqual(str(User.select().name.dtype), 'category')
+            self.assertEqual(str(User.query(sql='SELECT name FROM users').name.dtype), 'category')
+            # Arrow results are not compacted
+            self.assertIsInstance(User.select(output='arrow'), pa.Table)
+            if hasattr(pd, 'ArrowDtype'):
+                self.assertEqual(str(User.select(dtype_backend='pyarrow').name.dtype), 'string[pyarrow]')
+        finally:
+            config.COMPACT = False
+        self.assertRaises(ValueError, User.select, compact=True, output='arrow')
+        self.assertRaises(ValueError, User.select, compact=True, dtype_backend='pyarrow')
+
+    def test_compact_frame_is_lossless(self):
+        df = pd.DataFrame({
+            'a': [0.1, 0.5],
+            'b': [2 ** 40, 1],
+            'c': ['x', 'y'],
+            'd': [1.5, None],
+            })
+        compact_frame(df)
+        self.assertEqual([str(t) for t in df.dtypes], ['float64', 'int64', 'object', 'float32'])
+
     #def test_index_by(self):
     #    users = User({'name': ['John', 'Paul']})
     #    indexed = users.index_by('name')
@@ -1,14 +1,20 @@
+import abc
+import functools
 import unittest
+from unittest import mock
 import pandas as pd
 from freezegun import freeze_time
 from datetime import datetime, timedelta
 from time import sleep
 import pandas
 
+import jardin
 from jardin import Collection
-from jardin.model import RecordNotPersisted
+from jardin.database.datasources import Datasources
+from jardin.model import RecordNotPersisted, BelongsTo
 
 from tests import transaction
+from tests.query_tracer import QueryTracer
 
 from tests.models import JardinTestModel
 
@@ -18,6 +24,12 @@ class Project(JardinTestModel):
 class User(JardinTestModel):
     has_many = [Project]
 class JardinUser(JardinTestModel): pass
+class Comment(JardinTestModel):
+    belongs_to = {'authors': 'author_id'}
+class Review(JardinTestModel):
+    belongs_to = {'authors': 'author_id'}
+class Author(JardinTestModel):
+    has_many = [Comment, Review]
 
 
 class TestModel(unittest.TestCase):
@@ -154,6 +166,58 @@ class TestModel(unittest.TestCase):
         self.assertIsInstance(user_projects, Project.collection_class)
         self.assertEqual(user_projects.id.tolist(), [project.id])
 
+    @transaction(model=User, extra_tables=['projects'])
+    def test_includes(self):
+        if Project.db().config.scheme == 'sqlite':
+            Project.query(
+                sql="CREATE TABLE projects (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id integer);"
+                )
+        else:
+            Project.query(
+                sql="CREATE TABLE projects (id serial PRIMARY KEY, user_id integer);"
+                )
+        users = [User.insert(values={'name': name}) for name in ('Jardin', 'Potager', 'Verger')]
+        projects = [Project.insert(values={'user_id': user_id}) for user_id in (users[0].id, users[0].id, users[1].id)]
+        self.assertEqual(Project.find(projects[2].id).user().name, 'Potager')
+        with QueryTracer():
+            collection = User.select(includes=[Project], order='id')
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 2)
+            records = list(collection.records())
+            self.assertEqual(records[0].projects().id.tolist(), [projects[0].id, projects[1].id])
+            self.assertIsInstance(records[0].projects(), Project.collection_class)
+            self.assertEqual(records[1].projects().id.tolist(), [projects[2].id])
+            self.assertEqual(len(records[2].projects()), 0)
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 2)
+        self.assertEqual(records[0].projects(where={'id': projects[1].id}).id.tolist(), [projects[1].id])
+        user = User.find(users[0].id, includes=[Project])
+        self.assertEqual(user.projects().id.tolist(), [projects[0].id, projects[1].id])
+        self.assertEqual(len(user.projects(where={'id': projects[1].id})), 1)
+
+        with QueryTracer():
+            project_records = list(Project.select(includes=[User], order='id').records())
+            self.assertEqual([p.user().name for p in project_records], ['Jardin', 'Jardin', 'Potager'])
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 2)
+        self.assertRaises(ValueError, User.select, includes=[JardinUser])
+
+        User.soft_delete = True
+        try:
+            users[1].destroy()
+            self.assertIsNone(Project.find(projects[2].id).user())
+            project_records = list(Project.select(includes=[User], order='id').records())
+            self.assertIsNone(project_records[2].user())
+        finally:
+            User.soft_delete = False
+
+    @transaction(model=User)
+    def test_column_named_like_a_parent(self):
+        class Named(JardinTestModel):
+            table_name = 'users'
+            belongs_to = {'names': 'num'}
+        self.assertIsInstance(Named.__dict__['name'], BelongsTo)
+        User.insert(values={'name': 'Jardin'})
+        self.assertEqual(next(Named.select().records()).name, 'Jardin')
+        self.assertEqual(Named.find_by(values={'name': 'Jardin'}).name, 'Jardin')
+
     @transaction(model=User)
     def test_having(self):
         User.insert(values={'name': 'Jardin'})
@@ -163,6 +227,32 @@ class TestModel(unittest.TestCase):
         users = User.select(select='name', group='name', having='COUNT(*) > 1')
         self.assertEqual(len(users), 1)
 
+    @transaction(model=User)
+    def test_find_many(self):
+        User.bulk_insert([{'name': 'user %d' % i} for i in range(25)])
+        ids = [20, 3, 20, None, 7, 1000, 3, 12]
+        with QueryTracer():
+            users = User.find_many(ids, chunksize=2)
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 3)
+        self.assertIsInstance(users, Collection)
+        self.assertEqual(users.id.tolist(), [20, 3, 7, 12])
+        self.assertEqual(users.name.tolist(), ['user 19', 'user 2', 'user 6', 'user 11'])
+        with mock.patch.object(Datasources, 'disconnect_clients', wraps=Datasources.disconnect_clients) as disconnect:
+            concurrent = User.find_many(pandas.Series(ids).dropna().astype(int), chunksize=1, workers=3)
+            self.assertEqual(disconnect.call_count, 3)
+        self.assertTrue(concurrent.equals(users))
+        self.assertEqual(User.find_many(ids, where={'name': 'user 2'}).id.tolist(), [3])
+        self.assertEqual(User.find_many(['20', 3, '3', '7']).id.tolist(), [20, 3, 7])
+        joined = User.find_many(
+            [3, 20],
+            select=['u.id', 'o.name'],
+            inner_join=['users o ON o.id IN (u.id, u.id + 1)']
+            )
+        self.assertEqual(joined.id.tolist(), [3, 3, 20, 20])
+        with QueryTracer():
+            self.assertEqual(len(User.find_many([None])), 0)
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 0)
+
     @transaction(model=User)
     def test_touch(self):
         user = User.insert(values={'name': 'Jardin'})
@@ -176,5 +266,52 @@ class TestModel(unittest.TestCase):
                 user.reload()
                 self.assertTrue(user.updated_at > updated_at)
 
+    @transaction(model=User)
+    def test_record_attributes(self):
+        user = User(name='Jardin', extra=1)
+        self.assertEqual(list(user.attributes)[0], 'id')
+        self.assertIsNone(user.id)
+        self.assertEqual(user.name, 'Jardin')
+        self.assertIsNone(user.created_at)
+        self.assertEqual(user.extra, 1)
+        self.assertEqual(user['name'], 'Jardin')
+        class SlottedUser(jardin.Model):
+            __slots__ = ()
+            table_name = 'users'
+            db_names = JardinTestModel.db_names
+        self.assertFalse(hasattr(SlottedUser(name='Jardin'), '__dict__'))
+        # other models keep their instance dict, e.g. for cached properties or abc mixins
+        class CachedUser(JardinTestModel, abc.ABC):
+            table_name = 'users'
+            @functools.cached_property
+            def label(self):
+                return self.name.upper()
+        self.assertEqual(CachedUser(name='Jardin').label, 'JARDIN')
+        self.assertRaises(AttributeError, getattr, user, 'unknown')
+        self.assertFalse(hasattr(User, 'name'))
+        user.name = 'Potager'
+        user.other = 2
+        self.assertEqual(user.attributes['name'], 'Potager')
+        self.assertEqual(user['other'], 2)
+        self.assertFalse(user.persisted)
+        record = User.from_values(['id', 'name'], [1, 'Jardin'])
+        self.assertIsInstance(record, User)
+        self.assertEqual(record.id, 1)
+        self.assertIsNone(record.created_at)
+        self.assertTrue(record.persisted)
+
+    def test_relationships_are_wired_once(self):
+        self.assertIs(Author.__dict__['comments'].model_class, Comment)
+        self.assertIs(Author.__dict__['reviews'].model_class, Review)
+        self.assertIs(Comment.__dict__['author'].model_class, Author)
+        self.assertEqual(Comment.__dict__['author'].foreign_key, 'author_id')
+        class Editor(JardinTestModel): pass
+        Editor.has_many = [Comment]
+        Editor.init_relationships()
+        self.assertIs(Editor.__dict__['comments'].model_class, Comment)
+        relationships = dict(Author.__dict__)
+        Author.init_relationships()
+        self.assertEqual(dict(Author.__dict__), relationships)
+
 if __name__ == "__main__":
     unittest.main()
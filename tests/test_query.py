@@ -1,6 +1,8 @@
 import os
+import tempfile
 import unittest
 import jardin
+import jardin.config as config
 import time
 import pandas as pd
 from tests import transaction
@@ -54,6 +56,36 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(len(df), 1)
         self.assertEqual(df.name.iloc[0], 'jardin')
 
+    @transaction(model=User)
+    def test_query_filename_templates(self):
+        from jardin.database.sql_templates import SqlTemplates
+        User.insert(values={'name': 'jardin'})
+        directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(directory, 'users'))
+        filename = os.path.join(directory, 'users', 'count.sql')
+        with open(filename, 'w') as f:
+            f.write('SELECT COUNT(*) AS c FROM users;')
+        self.assertEqual(jardin.preload_queries('jardin_test', directory), [filename])
+        self.assertIn((filename, User.db().lexicon), SqlTemplates._templates)
+        self.assertEqual(jardin.query(filename=filename, db='jardin_test').c.iloc[0], 1)
+        with open(filename, 'w') as f:
+            f.write('SELECT COUNT(*) AS c FROM users WHERE id < 0;')
+        mtime = os.stat(filename).st_mtime_ns + 10 ** 9
+        os.utime(filename, ns=(mtime, mtime))
+        self.assertEqual(jardin.query(filename=filename, db='jardin_test').c.iloc[0], 0)
+
+    @transaction(model=User)
+    def test_query_chunksize(self):
+        User.bulk_insert([{'name': 'jardin%d' % i} for i in range(3)])
+        chunks = jardin.query(
+            sql='SELECT * FROM users ORDER BY id;',
+            db='jardin_test',
+            chunksize=2
+            )
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+        chunks = list(User.query(sql='SELECT * FROM users;', chunksize=2))
+        self.assertEqual(chunks[0].model_class, User)
+
     def test_snowflake_lexicon(self):
         from jardin.database.clients.sf import Lexicon
         sql, params = Lexicon.standardize_interpolators(
@@ -66,5 +98,44 @@ class TestQuery(unittest.TestCase):
             )
         self.assertEqual([1, 2], params)
 
+    def test_pg_statement_template(self):
+        from jardin.database.clients.pg import Lexicon
+        template, names, comment = Lexicon.statement_template(
+            "SELECT * FROM users u WHERE (name LIKE 'a%%') AND (id = %(val_0)s OR parent_id = %(val_0)s) LIMIT %(limit)s; /* app | app.py:handler:12 */",
+            {'val_0': 1, 'limit': 10}
+            )
+        self.assertEqual(template, "SELECT * FROM users u WHERE (name LIKE 'a%') AND (id = $1 OR parent_id = $1) LIMIT $2;")
+        self.assertEqual(names, ('val_0', 'limit'))
+        self.assertEqual(
+            Lexicon.execute_statement('jardin_1', names, comment),
+            'EXECUTE jardin_1 (%(val_0)s, %(limit)s) /* app | app.py:handler:12 */'
+            )
+        self.assertIsNone(Lexicon.statement_template('SELECT * FROM users WHERE id IN %(ids)s;', {'ids': (1, 2)}))
+        self.assertIsNone(Lexicon.statement_template('CREATE TABLE t (id integer);', {}))
+
+    @transaction(model=User)
+    def test_prepared_statements(self):
+        client = User.db().next_client()
+        if client.db_config.scheme != 'postgres':
+            return
+        config.PREPARED_STATEMENTS = True
+        size = config.PREPARED_STATEMENTS_CACHE_SIZE
+        config.PREPARED_STATEMENTS_CACHE_SIZE = 2
+        try:
+            user = User.insert(values={'name': 'jardin'})
+            for _ in range(3):
+                self.assertEqual(User.find(user.id).name, 'jardin')
+            User.select(where={'name': 'jardin'})
+            User.select(where={'id': [user.id]})
+            self.assertEqual(len(client._statements), 2)
+            prepared = jardin.query(sql='SELECT name FROM pg_prepared_statements;', db='jardin_test')
+            self.assertLessEqual(len(prepared), 2)
+            client.safely_disconnect()
+            self.assertEqual(len(client._statements), 0)
+            self.assertEqual(User.find(user.id).name, 'jardin')
+        finally:
+            config.PREPARED_STATEMENTS = False
+            config.PREPARED_STATEMENTS_CACHE_SIZE = size
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+import jardin.config as config
+from jardin.comparators import gt
+from jardin.database.clients.pg import Lexicon as PGLexicon
+from jardin.database.clients.sqlite import Lexicon as SQLiteLexicon
+from jardin.query_builders import SelectQueryBuilder, query_templates
+
+from tests import transaction
+from tests.models import JardinTestModel
+
+
+class User(JardinTestModel):
+    scopes = {
+        'named': {'name': 'jardin'},
+        'recent': ['created_at > %(since)s', {'since': datetime(2020, 1, 1)}]
+        }
+
+
+WHERES = [
+    None,
+    'id > 1',
+    {'id': 1},
+    {'id': [1, 2, 3], 'name': None},
+    {'id': pd.Series([4, 5])},
+    {'created_at': (datetime(2020, 1, 1), datetime(2021, 1, 1))},
+    {'data': {'count': 1, 'ratio': 0.5, 'label': 'a'}},
+    ['name = %(name)s OR name = %(other)s', {'name': 'jardin', 'other': 'potager'}],
+    [{'id': [1, 2]}, 'id < 10', ['name IN %(names)s', {'names': ['a', 'b']}]],
+    ]
+
+
+class TestQueryTemplates(unittest.TestCase):
+
+    def setUp(self):
+        query_templates.clear()
+
+    def tearDown(self):
+        query_templates.clear()
+
+    def build(self, lexicon, scheme, **kwargs):
+        return SelectQueryBuilder(
+            model_metadata=User.model_metadata(include_schema=False),
+            lexicon=lexicon,
+            scheme=scheme,
+            stack='tests.py:test:1',
+            **kwargs
+            ).query
+
+    def test_cached_queries_are_identical(self):
+        for (lexicon, scheme) in ((PGLexicon, 'postgres'), (SQLiteLexicon, 'sqlite')):
+            for where in WHERES:
+                for kwargs in ({}, {'limit': 1, 'order': 'id'}, {'scopes': ['named', 'recent'], 'select': ['id']}):
+                    query_templates.clear()
+                    expected = self.build(lexicon, scheme, where=where, **kwargs)
+                    self.assertEqual(query_templates.stats()['size'], 1)
+                    self.assertEqual(self.build(lexicon, scheme, where=where, **kwargs), expected)
+                    self.assertEqual(query_templates.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_values_are_bound(self):
+        query, params = self.build(PGLexicon, 'postgres', where={'id': 1}, limit=1)
+        self.assertEqual(query, 'SELECT * FROM users u WHERE (id = %(val_0)s) LIMIT %(limit)s; /* | tests.py:test:1 */')
+        query, params = self.build(PGLexicon, 'postgres', where={'id': 2}, limit=10)
+        self.assertEqual(query, 'SELECT * FROM users u WHERE (id = %(val_0)s) LIMIT %(limit)s; /* | tests.py:test:1 */')
+        self.assertEqual(dict(params), {'val_0': 2, 'limit': 10})
+        self.build(PGLexicon, 'postgres', where={'id': 2})
+        self.build(SQLiteLexicon, 'sqlite', where={'id': [1, 2]})
+        self.build(SQLiteLexicon, 'sqlite', where={'id': [1, 2, 3]})
+        self.assertEqual(query_templates.stats(), {'hits': 1, 'misses': 4, 'size': 4})
+
+    def test_uncacheable_queries(self):
+        self.build(PGLexicon, 'postgres', where={'id': gt(1)})
+        self.build(PGLexicon, 'postgres', where={'id': gt(1)})
+        self.assertEqual(query_templates.stats()['size'], 0)
+
+    def test_lru(self):
+        size = config.QUERY_TEMPLATE_CACHE_SIZE
+        config.QUERY_TEMPLATE_CACHE_SIZE = 2
+        try:
+            for column in ('a', 'b', 'a', 'c'):
+                self.build(PGLexicon, 'postgres', where={column: 1})
+            self.assertEqual(query_templates.stats(), {'hits': 1, 'misses': 3, 'size': 2})
+            self.build(PGLexicon, 'postgres', where={'a': 1})
+            self.assertEqual(query_templates.stats()['hits'], 2)
+            config.QUERY_TEMPLATE_CACHE_SIZE = 0
+            query_templates.clear()
+            self.build(PGLexicon, 'postgres', where={'a': 1})
+            self.assertEqual(query_templates.stats(), {'hits': 0, 'misses': 0, 'size': 0})
+        finally:
+            config.QUERY_TEMPLATE_CACHE_SIZE = size
+
+    def test_in_lists(self):
+        query, params = self.build(PGLexicon, 'postgres', where={'id': [1, 2, 3]})
+        self.assertIn('WHERE (id = ANY(%(val_0)s::bigint[]))', query)
+        self.assertEqual(params, {'val_0': [1, 2, 3]})
+        query, params = self.build(PGLexicon, 'postgres', where={'id': pd.Series([4, 5])})
+        self.assertEqual(params, {'val_0': [4, 5]})
+        query, params = self.build(PGLexicon, 'postgres', where={'name': ['a', 'b']})
+        self.assertIn('WHERE (name IN %(val_0)s)', query)
+        metadata = dict(User.model_metadata(include_schema=False), table_schema={'name': {'type': 'character varying'}})
+        query, params = SelectQueryBuilder(
+            model_metadata=metadata, lexicon=PGLexicon, scheme='postgres', where={'u.name': ['a', 'b']}
+            ).query
+        self.assertIn('WHERE (u.name = ANY(%(val_0)s::text[]))', query)
+        query, params = self.build(SQLiteLexicon, 'sqlite', where={'id': list(range(3))})
+        self.assertIn('WHERE (id IN (:val_0, :val_1, :val_2))', query)
+        query, params = self.build(SQLiteLexicon, 'sqlite', where={'id': list(range(1000))})
+        self.assertIn('WHERE (id IN (SELECT value FROM json_each(:val_0)))', query)
+        self.assertEqual(len(params), 1)
+        query, params = self.build(SQLiteLexicon, 'sqlite', where={'created_at': [datetime(2020, 1, 1)] * 101})
+        self.assertEqual(len(params), 101)
+        self.build(SQLiteLexicon, 'sqlite', where={'id': list(range(1000, 2000))})
+        # Both lists of ids of each database share a template
+        self.assertEqual(query_templates.stats()['hits'], 2)
+
+    @transaction(model=User)
+    def test_large_in_list(self):
+        User.bulk_insert([{'name': 'user %d' % i} for i in range(10)])
+        ids = list(range(-50000, 0)) + [3, 5]
+        self.assertEqual(sorted(User.select(where={'id': ids}).id.tolist()), [3, 5])
+        self.assertEqual(User.count(where={'id': ids}), 2)
+        User.delete(where={'id': ids})
+        self.assertEqual(User.count(), 8)
+
+    @transaction(model=User)
+    def test_select(self):
+        User.insert(values={'name': 'jardin'})
+        User.insert(values={'name': 'potager'})
+        for name in ('jardin', 'potager'):
+            users = User.select(where={'name': name}, limit=1)
+            self.assertEqual(users.name.tolist(), [name])
+        self.assertEqual(User.find_by(values={'name': 'potager'}).name, 'potager')
+        self.assertGreaterEqual(query_templates.stats()['hits'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from concurrent import futures
+
+import jardin
+from jardin.database.schema_cache import SchemaCache
+
+from tests import transaction
+from tests.models import JardinTestModel
+from tests.query_tracer import QueryTracer
+
+
+class User(JardinTestModel):
+    pass
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SchemaCache.get('jardin_test')
+        self.cache.clear()
+        self.path = os.path.join(tempfile.mkdtemp(), 'schemas.json')
+
+    def tearDown(self):
+        self.cache.clear()
+        User.clear_caches()
+
+    @transaction(model=User)
+    def test_preload_schemas(self):
+        tables = jardin.preload_schemas('jardin_test')
+        self.assertIn('users', tables)
+        self.assertEqual(tables['users'][0][0], 'id')
+        with QueryTracer():
+            self.assertEqual(User.table_schema()['name']['type'], 'varchar(256)')
+            self.assertIsNone(User.table_schema()['id']['default'])
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 0)
+
+    @transaction(model=User)
+    def test_persisted_schemas(self):
+        tables = jardin.preload_schemas('jardin_test', path=self.path, fingerprint='v1')
+        self.assertTrue(os.path.exists(self.path))
+        self.cache.clear()
+        with QueryTracer():
+            self.assertEqual(jardin.preload_schemas('jardin_test', path=self.path, fingerprint='v1'), tables)
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 0)
+        self.cache.clear()
+        with QueryTracer():
+            jardin.preload_schemas('jardin_test', path=self.path, fingerprint='v2')
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 1)
+        self.assertRaises(ValueError, jardin.preload_schemas, 'jardin_test', path=self.path)
+
+    @transaction(model=User)
+    def test_single_flight(self):
+        with QueryTracer():
+            with futures.ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: jardin.preload_schemas('jardin_test'), range(8)))
+            self.assertEqual(len(QueryTracer.get_report()['query_list']), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    @transaction(model=User)
+    def test_single_flight_per_table(self):
+        class Other(JardinTestModel):
+            pass
+        User.clear_caches()
+        loading, release = threading.Event(), threading.Event()
+        query_schema = User.query_schema.__func__
+
+        def slow_query_schema(cls):
+            loading.set()
+            release.wait(10)
+            return query_schema(cls)
+
+        with mock.patch.object(User, 'query_schema', classmethod(slow_query_schema)):
+            users = threading.Thread(target=User.table_schema)
+            users.start()
+            try:
+                self.assertTrue(loading.wait(10))
+                others = threading.Thread(target=Other.table_schema)
+                others.start()
+                others.join(10)
+                self.assertFalse(others.is_alive())
+            finally:
+                release.set()
+                users.join()
+        self.assertIn('name', User.table_schema())
+
+    @transaction(model=User)
+    def test_unknown_table_falls_back_to_query(self):
+        jardin.preload_schemas('jardin_test')
+        User.query(sql='CREATE TABLE late_tables (id INTEGER PRIMARY KEY, name text);')
+        try:
+            class LateTable(JardinTestModel):
+                pass
+            self.assertEqual(sorted(LateTable.table_schema().keys()), ['id', 'name'])
+        finally:
+            User.query(sql='DROP TABLE late_tables;')
+
+
+if __name__ == "__main__":
+    unittest.main()
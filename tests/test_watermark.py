@@ -0,0 +1,136 @@
+import unittest
+from unittest import mock
+
+from jardin import config
+from jardin.database.clients.pg import Lexicon as PGLexicon
+from jardin.tools import watermark_marker, _call_site_markers
+
+from tests import transaction
+from tests.models import JardinTestModel
+from tests.query_tracer import QueryTracer
+
+
+class User(JardinTestModel): pass
+
+
+class TestWatermark(unittest.TestCase):
+
+    def tearDown(self):
+        config.WATERMARK_MODE = 'frame'
+        config.WATERMARK_TRANSPORT = 'comment'
+
+    def test_frame_marker(self):
+        marker = watermark_marker()
+        filename, function_name, line_number = marker.split(':')
+        self.assertEqual(filename, __file__)
+        self.assertEqual(function_name, 'test_frame_marker')
+        self.assertTrue(line_number.isdigit())
+
+    def test_frame_marker_is_memoized(self):
+        markers = [watermark_marker() for _ in range(2)]
+        self.assertIs(markers[0], markers[1])
+        self.assertIn(markers[0], _call_site_markers.values())
+
+    def test_off(self):
+        config.WATERMARK_MODE = 'off'
+        self.assertEqual(watermark_marker(), '')
+
+    def test_sampled(self):
+        config.WATERMARK_MODE = 'sampled'
+        sample_rate = config.WATERMARK_SAMPLE_RATE
+        try:
+            config.WATERMARK_SAMPLE_RATE = 0.1
+            with mock.patch('jardin.tools.random.random', return_value=0.05):
+                self.assertIn(':test_sampled:', watermark_marker())
+            with mock.patch('jardin.tools.random.random', return_value=0.1):
+                self.assertEqual(watermark_marker(), '')
+        finally:
+            config.WATERMARK_SAMPLE_RATE = sample_rate
+
+    def test_call_site_markers_are_bounded(self):
+        with mock.patch('jardin.tools.CALL_SITE_MARKERS_SIZE', 1):
+            watermark_marker()
+            watermark_marker()
+            self.assertEqual(len(_call_site_markers), 1)
+
+    @transaction(model=User)
+    def test_select_marks_caller(self):
+        with QueryTracer():
+            User.select()
+            sql = QueryTracer.get_report()['query_list'][-1]['query'][0]
+        self.assertIn('jardin_test:%s:test_select_marks_caller:' % __file__, sql)
+
+    @transaction(model=User)
+    def test_select_without_watermark(self):
+        config.WATERMARK_MODE = 'off'
+        with QueryTracer():
+            User.select()
+            sql = QueryTracer.get_report()['query_list'][-1]['query'][0]
+        self.assertNotIn('/*', sql)
+
+
+    @transaction(model=User)
+    def test_instrumentation_transport(self):
+        from tests.test_instrumentation import TestSubscriber
+        config.WATERMARK_TRANSPORT = 'instrumentation'
+        subscriber = TestSubscriber()
+        subscriber_id = config.notifier.subscribe(subscriber)
+        try:
+            with QueryTracer():
+                User.select(where={'id': 1})
+                User.select(where={'id': 2})
+                queries = QueryTracer.get_report()['query_list']
+        finally:
+            config.notifier.unsubscribe(subscriber_id)
+        self.assertEqual(queries[-1]['query'][0], queries[-2]['query'][0])
+        self.assertNotIn('/*', queries[-1]['query'][0])
+        watermarks = [e.tags.get('watermark') for e in subscriber.published_events if e.name == 'query'][-2:]
+        self.assertIn('jardin_test:%s:test_instrumentation_transport:' % __file__, watermarks[0])
+        self.assertNotEqual(watermarks[0], watermarks[1])
+
+    @transaction(model=User)
+    def test_unknown_transport(self):
+        config.WATERMARK_TRANSPORT = 'headers'
+        self.assertRaises(ValueError, User.select)
+
+    def test_session_transport(self):
+        sql, params = PGLexicon.session_watermark_query('app | ' + 'x' * 100 + ':handler:12')
+        self.assertEqual(sql, 'SET application_name = %(application_name)s')
+        self.assertEqual(len(params['application_name']), 63)
+        self.assertTrue(params['application_name'].endswith(':handler:12'))
+        sql, params = PGLexicon.session_watermark_query('é' * 40)
+        self.assertEqual(params['application_name'], 'é' * 31)
+        self.assertEqual(PGLexicon.session_watermark_query(''), ('RESET application_name', None))
+
+    def test_session_transport_resets_stale_watermark(self):
+        client = User.db().next_client()
+        conn = mock.MagicMock()
+        with mock.patch.object(type(client), 'lexicon', PGLexicon):
+            client.set_session_watermark(conn, 'app:handler:12')
+            client.set_session_watermark(conn, 'app:handler:12')
+            client.set_session_watermark(conn, '')
+            client.set_session_watermark(conn, '')
+        queries = [c.args for c in conn.cursor.return_value.execute.call_args_list]
+        self.assertEqual(queries, [
+            ('SET application_name = %(application_name)s', {'application_name': 'app:handler:12'}),
+            ('RESET application_name', None),
+            ])
+        self.assertIsNone(client._session_watermark)
+
+    @transaction(model=User)
+    def test_session_transport_sets_application_name(self):
+        client = User.db().next_client()
+        if client.db_config.scheme != 'postgres':
+            return
+        config.WATERMARK_TRANSPORT = 'session'
+        User.select()
+        application_name = User.query(sql='SHOW application_name;').iloc[0, 0]
+        self.assertIn('test_session_transport_sets_application_name', application_name)
+        config.WATERMARK_MODE = 'off'
+        self.assertEqual(User.query(sql='SHOW application_name;').iloc[0, 0], '')
+        client.safely_disconnect()
+        self.assertIsNone(client._session_watermark)
+
+
+if __name__ == "__main__":
+    unittest.main()